@@ -0,0 +1,81 @@
+#Benchmarks of fitting
+
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from longscurvefitting import oneClickCurveFitting, queryModel, getInitialGuess, curve_fit_m, basicModels_nameList
+
+from .common import dataset
+
+class CurveFitBasicModel:
+    '''`curve_fit_m` on each basic model, from the data-driven initial guess.'''
+    params = basicModels_nameList
+    param_names = ['modelname']
+
+    def setup(self, modelname):
+        self.xdata, self.ydata = dataset(200)
+        self.model = queryModel(modelname)
+        self.p0 = getInitialGuess(self.model, self.xdata, self.ydata)
+        self.time_curve_fit_m(modelname)     #compile kernels, if Numba is installed
+
+    def time_curve_fit_m(self, modelname):
+        try:
+            curve_fit_m(self.model, self.xdata, self.ydata, p0=self.p0, method='trf')
+        except RuntimeError:
+            pass
+
+class CurveFitComposite:
+    '''`curve_fit_m` on composites of 1 to 4 basic models.'''
+    params = [1, 2, 3, 4]
+    param_names = ['n_functions']
+    functions = ['gaussian', 'linear', 'exponential', 'logistic']
+
+    def setup(self, n_functions):
+        self.xdata, self.ydata = dataset(200)
+        self.model = queryModel('operation_' + '_'.join(self.functions[:n_functions]) if n_functions > 1 else self.functions[0])
+        self.p0 = getInitialGuess(self.model, self.xdata, self.ydata)
+        self.time_curve_fit_m(n_functions)
+
+    def time_curve_fit_m(self, n_functions):
+        try:
+            curve_fit_m(self.model, self.xdata, self.ydata, p0=self.p0, method='trf')
+        except RuntimeError:
+            pass
+
+class OneClickCurveFitting:
+    '''The whole search without plotting, on datasets of 20 to 10^6 points. The best cost per point is tracked to catch regressions of quality.'''
+    params = [20, 1000, 100000, 1000000]
+    param_names = ['size']
+    functions = ['constant', 'linear', 'quadratic', 'gaussian', 'exponential', 'logistic']
+    number = 1
+    repeat = (1, 3, 60.0)
+    timeout = 1800
+
+    def setup(self, size):
+        self.xdata, self.ydata = dataset(size)
+
+    def fit(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return oneClickCurveFitting(self.xdata, self.ydata, functions=self.functions, plot_opt=0, silent=True, output=io.StringIO(), **kwargs)
+
+    def time_exhaustive(self, size):
+        self.fit()
+
+    def time_halving(self, size):
+        self.fit(search='halving')
+
+    def time_reduced(self, size):
+        self.fit(search='reduced')
+
+    def time_stepwise(self, size):
+        self.fit(search='stepwise', maxCombination=3)
+
+    def track_best_cost(self, size):
+        model, paras = self.fit(feedback=True)
+        return float(np.mean((model(self.xdata, *paras) - self.ydata)**2))
+
+    def track_best_cost_reduced(self, size):
+        model, paras = self.fit(feedback=True, search='reduced')
+        return float(np.mean((model(self.xdata, *paras) - self.ydata)**2))
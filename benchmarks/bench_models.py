@@ -0,0 +1,52 @@
+#Benchmarks of model generation
+
+import numpy as np
+
+from longscurvefitting import generateModels, clearModels, warmModels, queryModel, funcArgsNr
+
+class GenerateModels:
+    '''`generateModels` on a cold and a warm model registry.'''
+    params = ([1, 2, 3, 4], [False, True])
+    param_names = ['maxCombination', 'piecewise']
+    number = 1
+    timeout = 600
+
+    def setup(self, maxCombination, piecewise):
+        clearModels()
+
+    def time_cold(self, maxCombination, piecewise):
+        generateModels(dataLength=np.inf, piecewise=piecewise, maxCombination=maxCombination)
+
+    def time_warm(self, maxCombination, piecewise):
+        #the first call fills the registry, so most of the time is of the warm ones
+        for _ in range(5):
+            generateModels(dataLength=np.inf, piecewise=piecewise, maxCombination=maxCombination)
+
+    def track_models(self, maxCombination, piecewise):
+        return len(generateModels(dataLength=np.inf, piecewise=piecewise, maxCombination=maxCombination))
+
+class QueryModel:
+    params = ['gaussian', 'operation_gaussian_linear', 'operation_gaussian_linear_exponential', 'piecewise_gaussian_linear']
+    param_names = ['modelname']
+
+    def setup(self, modelname):
+        clearModels()
+        warmModels(maxCombination=3)
+
+    def time_query(self, modelname):
+        queryModel(modelname)
+
+class EvaluateModel:
+    '''Evaluations of compiled models, the innermost loop of fitting.'''
+    params = (['gaussian', 'pearson3', 'operation_gaussian_linear', 'operation_cauchy_pearson3_linear', 'piecewise_gaussian_linear'], [200, 100000])
+    param_names = ['modelname', 'size']
+
+    def setup(self, modelname, size):
+        self.model = queryModel(modelname)
+        self.xdata = np.linspace(1, 10, size)
+        self.paras = np.linspace(1, 2, funcArgsNr(self.model)-1)
+        self.paras[0] = 5.0     #`x0` of piecewise models
+        self.model(self.xdata, *self.paras)     #compile kernels, if enabled by `useNumba`
+
+    def time_evaluate(self, modelname, size):
+        self.model(self.xdata, *self.paras)
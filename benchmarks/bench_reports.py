@@ -0,0 +1,51 @@
+#Benchmarks of report writing
+
+import os
+import tempfile
+import importlib.util
+
+from longscurvefitting import openReport, writeLogsDicts2csv
+
+from .common import reportRows
+
+class WriteReport:
+    params = (['csv', 'jsonl', 'parquet'], [1000, 100000])
+    param_names = ['format', 'rows']
+    number = 1
+
+    def setup(self, format, rows):
+        if format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+            raise NotImplementedError('pyarrow is not installed')
+        self.rows = reportRows(rows)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'report.' + format)
+
+    def teardown(self, format, rows):
+        self.directory.cleanup()
+
+    def time_write(self, format, rows):
+        with openReport(self.path, format=format) as writer:
+            writer.write(self.rows)
+
+    def time_write_streaming(self, format, rows):
+        #a row per write, as fits finish
+        with openReport(self.path, format=format) as writer:
+            for row in self.rows:
+                writer.write(row)
+
+class WriteLogsDicts2csv:
+    '''The legacy csv writer, as a baseline.'''
+    params = [1000, 100000]
+    param_names = ['rows']
+    number = 1
+
+    def setup(self, rows):
+        self.rows = reportRows(rows)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'report.csv')
+
+    def teardown(self, rows):
+        self.directory.cleanup()
+
+    def time_write(self, rows):
+        writeLogsDicts2csv(self.path, self.rows)
@@ -0,0 +1,35 @@
+#Synthetic datasets of benchmarks, generated with fixed seeds, so results are comparable across commits
+
+import numpy as np
+
+from longscurvefitting.models import gaussian, linear
+
+SEED = 20210101
+
+def dataset(size, seed=SEED):
+    '''A gaussian peak on a linear trend with gaussian noise, over [1, 10].
+
+    Parameters:
+        size: number of points
+            Type: integer
+        seed: seed of noise
+            Type: integer
+            Default: SEED
+    Returns:
+        xdata, ydata:
+            Type: numpy.ndarray
+    '''
+    rng = np.random.default_rng(seed)
+    xdata = np.linspace(1, 10, size)
+    ydata = gaussian(xdata, 5, 4, 1) + linear(xdata, 0.3, 1) + rng.normal(0, 0.1, size)
+    return xdata, ydata
+
+def reportRows(size, seed=SEED):
+    '''Rows of report as `fitModels` outputs, with random parameters of 2 to 7 numbers.'''
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(size):
+        n = int(rng.integers(2, 8))
+        rows.append({'modelname':'model_%d' % (i % 100), 'form':'Default', 'paras_symbol':'a,b',
+                     'parameters':rng.normal(size=n).tolist(), 'stdevs':rng.random(n).tolist(), 'cost':float(rng.random())})
+    return rows
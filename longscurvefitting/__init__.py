@@ -1,14 +1,28 @@
 from .longscurvefitting import oneClickCurveFitting
 from .longscurvefitting import generateFunction
-from .longscurvefitting import generateModels
-from .longscurvefitting import queryModel
+from .longscurvefitting import generateModels, iterModels, canonicalFunctions
+from .longscurvefitting import queryModel, parseModelName
+from .longscurvefitting import fitModels, halvingSearch, reducedSearch, stepwiseSearch, summarizeReport
+from .longscurvefitting import scoreFit, criterionKey, CRITERIA
+from .longscurvefitting import fitMany
+from .longscurvefitting import warmModels, clearModels
+from .longscurvefitting import getInitialGuess, scanBreakpoints, piecewiseSparsity
+from .longscurvefitting import multiStart, startPoints
 
-from .scipycurvefitm import curve_fit_m
+from .scipycurvefitm import curve_fit_m, FitTimeout
+from .batchcurvefit import curve_fit_batch
+from .store import FittedModelStore
+from .incremental import IncrementalFitter
+from .sampling import subsampleData, subsampleIndex, binData
+from .expressions import Expr, Leaf, Operation, Piecewise, modelExpr, compileExpr
 
 from .models import basicModels
 from .models import basicModels_nameList
 from .models import basicModels_nonp_nameList
+from .models import basicModels_dict
+from .kernels import useNumba, verifyKernels
 
-from ._helpers import curve_fit_plot
+from ._helpers import curve_fit_plot, plotModels
+from .reports import openReport, ReportWriter, CSVReportWriter, JSONLReportWriter, ParquetReportWriter
 from ._helpers import writeLogsDicts2csv
 from ._helpers import funcArgs, funcArgsNr
\ No newline at end of file
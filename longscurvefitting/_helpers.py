@@ -1,17 +1,21 @@
 #Assistant functions
 
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-mpl.rcParams['figure.figsize'] = [4, 4] # width and height in inches
-mpl.rcParams['savefig.dpi'] = 300
-mpl.rcParams['font.size'] = 12
-mpl.rcParams['lines.linewidth'] = 1.0	# in points
-plt.rcParams['font.family'] = 'Times New Roman'
-
 import pathlib
 import csv
 import time
 import inspect
+import os
+import numbers
+from itertools import repeat
+
+#matplotlib is imported only when plotting, and these settings take effect only in plotting rather than mutating global `rcParams`
+plotParams = {
+    'figure.figsize': [4, 4], # width and height in inches
+    'savefig.dpi': 300,
+    'font.size': 12,
+    'lines.linewidth': 1.0,	# in points
+    'font.family': 'Times New Roman',
+    }
 
 #A simple plotting function to visualize outputs
 def curve_fit_plot(xdata, ydata, ydata_fit, function_name, xscale=None, yscale=None, filename_startwith='curvefit'):
@@ -38,31 +42,156 @@ def curve_fit_plot(xdata, ydata, ydata_fit, function_name, xscale=None, yscale=N
     Returns:
         None
     '''
-    fig = plt.figure()
-    #frame1 = fig.add_axes([.1,.3,.8,.6]) if 'power_law' not in function_name else fig.add_axes([.1,.38,.8,.52])
-    frame1 = fig.add_axes([.1,.3,.8,.6])
-    plt.plot(xdata, ydata, '.', label='data')
-    plt.plot(xdata, ydata_fit, '-', label=function_name)
-    plt.legend()
-    plt.ylabel('y-data')
-    plt.grid(True)
-    plt.xticks([]) #disable x ticks
-
-    if xscale: plt.xscale(xscale)
-    if yscale: plt.yscale(yscale)
+    _renderPNG([(function_name, ydata_fit)], xdata, ydata, [(xscale, yscale)], filename_startwith)
 
+def _figureTemplate(xdata, ydata):
+    '''Create a figure as `curve_fit_plot` with an empty fitted curve, which is reused by all models. No pyplot, so no global state or GUI backend is touched.'''
+    from matplotlib.figure import Figure
+    fig = Figure()
+    frame1 = fig.add_axes([.1,.3,.8,.6])
+    frame1.plot(xdata, ydata, '.', label='data')
+    fit_line, = frame1.plot(xdata, ydata, '-')
+    frame1.set_ylabel('y-data')
+    frame1.grid(True)
+    frame1.set_xticks([]) #disable x ticks
     #residual subplot
     frame2 = fig.add_axes([.1,.1,.8,.2])
-    plt.plot(xdata,ydata_fit-ydata,'k')
-    plt.ylabel('Residuals')
-    plt.grid(True)
-    if xscale: plt.xscale(xscale)	
-
-    output = pathlib.Path('curvefit/%s_%s_%s.png' % (filename_startwith, function_name, str(int(time.time()*1e6))))
-    output.parent.mkdir(parents=True, exist_ok=True)
-    plt.savefig(output, bbox_inches = 'tight',pad_inches = 0)
-    plt.close()
-    #time.sleep(3)
+    residual_line, = frame2.plot(xdata, ydata*0, 'k')
+    frame2.set_ylabel('Residuals')
+    frame2.grid(True)
+    return fig, (frame1, frame2), (fit_line, residual_line)
+
+def _drawTemplate(template, ydata, ydata_fit, function_name, xscale=None, yscale=None):
+    '''Update the figure template by a fitted curve.'''
+    fig, (frame1, frame2), (fit_line, residual_line) = template
+    fit_line.set_ydata(ydata_fit)
+    fit_line.set_label(function_name)
+    residual_line.set_ydata(ydata_fit-ydata)
+    frame1.legend()
+    frame1.set_xscale(xscale or 'linear')
+    frame1.set_yscale(yscale or 'linear')
+    frame2.set_xscale(xscale or 'linear')
+    for frame in (frame1, frame2):
+        frame.relim()
+        frame.autoscale_view()
+    return fig
+
+def _renderPNG(items, xdata, ydata, scales, filename_startwith):
+    '''Render figures of models by one figure template. It's the unit of work of `plotModels`.'''
+    import matplotlib
+    with matplotlib.rc_context(plotParams):
+        template = _figureTemplate(xdata, ydata)
+        for function_name, ydata_fit in items:
+            for xscale, yscale in scales:
+                fig = _drawTemplate(template, ydata, ydata_fit, function_name, xscale, yscale)
+                output = pathlib.Path('curvefit/%s_%s_%s.png' % (filename_startwith, function_name, str(int(time.time()*1e6))))
+                output.parent.mkdir(parents=True, exist_ok=True)
+                fig.savefig(output, bbox_inches = 'tight',pad_inches = 0)
+
+def resolveJobs(n_jobs):
+    '''Resolve `n_jobs` into the number of workers, all CPUs if it's -1 or None.'''
+    if n_jobs is None or n_jobs == -1:
+        return os.cpu_count() or 1
+    if isinstance(n_jobs, bool) or not isinstance(n_jobs, numbers.Integral) or n_jobs < 1:
+        raise ValueError('Error -- "n_jobs" must be a positive integer, or -1 for all CPUs')
+    return int(n_jobs)
+
+def plotModels(items, xdata, ydata, xscale=None, yscale=None, filename_startwith='curvefit', plot_format='png', n_jobs=1, executor=None):
+    '''Plot figures of a lot of fitted models in batch. Figures in the same format of `curve_fit_plot` are drawn on a reused figure template, with the Agg renderer.
+
+    Parameters:
+        items: name of models and their fitted dependent data. Nothing is plotted if it's empty.
+            Type: list of tuples (function_name, ydata_fit)
+        xdata: the independent variable where the data is measured.
+            Type: array_like
+        ydata: the dependent data.
+            Type: array_like
+        xscale: one of {"linear", "log", "symlog", "logit", ...}. If given, plot another figure on this scale besides the linear one.
+            Type: string
+            Default: None
+        yscale: one of {"linear", "log", "symlog", "logit", ...}. If given, plot another figure on this scale besides the linear one.
+            Type: string
+            Default: None
+        filename_startwith: a custom string mark as part of output filename
+            Type: string
+            Default: 'curvefit'
+        plot_format: 'png' for a figure per model, 'pdf' for a multi-page pdf file, or 'grid' for an image of all models on a grid.
+            Type: string
+            Default: 'png'
+        n_jobs: the number of workers to render 'png' figures. If it's -1, use all CPUs, and other values below 1 raise `ValueError`.
+            Type: integer
+            Default: 1
+        executor: "process", "thread" or an existing instance of `concurrent.futures.Executor` to render 'png' figures. If None, use "process" when `n_jobs` is not 1.
+            Type: string or object
+            Default: None
+    Returns:
+        None
+    '''
+    import numpy as np
+    import matplotlib
+    if not items:
+        return
+    xdata, ydata = np.asarray(xdata), np.asarray(ydata)
+    if xscale == 'linear': xscale=None
+    if yscale == 'linear': yscale=None
+    #'linear' scale will be used and plot as a default and basic
+    scales = [(None, None)] + ([(xscale, yscale)] if xscale or yscale else [])
+    stamp = str(int(time.time()*1e6))
+
+    if plot_format == 'png':
+        from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+        if isinstance(executor, Executor):
+            pool, owned = executor, False
+            n_jobs = getattr(pool, '_max_workers', None) or os.cpu_count() or 1
+        elif executor not in (None, 'process', 'thread'):
+            raise ValueError('Error -- "executor" must be "process", "thread" or an instance of concurrent.futures.Executor')
+        else:
+            pool, owned, n_jobs = None, True, resolveJobs(n_jobs)
+        n_jobs = min(n_jobs, len(items))
+        if pool is None and n_jobs <= 1:
+            _renderPNG(items, xdata, ydata, scales, filename_startwith)
+            return
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=n_jobs) if executor == 'thread' else ProcessPoolExecutor(max_workers=n_jobs)
+        #settings are entered here as well, so threads restore them to the same ones on leaving theirs
+        try:
+            with matplotlib.rc_context(plotParams):
+                list(pool.map(_renderPNG, [items[i::n_jobs] for i in range(n_jobs)], repeat(xdata), repeat(ydata), repeat(scales), repeat(filename_startwith)))
+        finally:
+            if owned: pool.shutdown()
+    elif plot_format == 'pdf':
+        from matplotlib.backends.backend_pdf import PdfPages
+        output = pathlib.Path('curvefit/%s_figures_%s.pdf' % (filename_startwith, stamp))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with matplotlib.rc_context(plotParams), PdfPages(output) as pdf:
+            template = _figureTemplate(xdata, ydata)
+            for function_name, ydata_fit in items:
+                for xscale, yscale in scales:
+                    pdf.savefig(_drawTemplate(template, ydata, ydata_fit, function_name, xscale, yscale), bbox_inches = 'tight',pad_inches = 0)
+    elif plot_format == 'grid':
+        from matplotlib.figure import Figure
+        ncols = int(np.ceil(np.sqrt(len(items))))
+        nrows = int(np.ceil(len(items) / ncols))
+        output = pathlib.Path('curvefit/%s_grid_%s.png' % (filename_startwith, stamp))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with matplotlib.rc_context(plotParams):
+            width, height = matplotlib.rcParams['figure.figsize']
+            fig = Figure(figsize=(width*ncols, height*nrows*len(scales)))
+            axes = fig.subplots(nrows*len(scales), ncols, squeeze=False)
+            for i, (function_name, ydata_fit) in enumerate(items):
+                for j, (xscale, yscale) in enumerate(scales):
+                    ax = axes[i // ncols * len(scales) + j, i % ncols]
+                    ax.plot(xdata, ydata, '.', label='data')
+                    ax.plot(xdata, ydata_fit, '-', label=function_name)
+                    ax.legend()
+                    ax.grid(True)
+                    if xscale: ax.set_xscale(xscale)
+                    if yscale: ax.set_yscale(yscale)
+            for ax in axes.flat:
+                if not ax.has_data(): ax.set_visible(False)
+            fig.savefig(output, bbox_inches = 'tight')
+    else:
+        raise ValueError('Error -- "plot_format" must be "png", "pdf" or "grid"')
 
 def fileIsValid(filename):
     '''Check if a file exist and non-empty
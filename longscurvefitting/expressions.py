@@ -0,0 +1,340 @@
+#Expression trees of composite models -- sums, differences, products, quotients and piecewise functions of basic models, compiled into one evaluator
+
+import inspect
+from functools import lru_cache
+
+import numpy as np
+
+from .models import basicModels_dict
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+#min size of data to fuse the arithmetic between basic models by numexpr, if it's installed. Below it, numexpr costs more than it saves.
+NUMEXPR_MIN_SIZE = 65536
+
+class Expr:
+    '''Base of nodes of expression trees. Nodes are immutable, equal and hashed by structure (`key`), so structurally equal trees share one compiled evaluator.
+    Nodes are combined by arithmetic operators, e.g. `Leaf('gaussian') + Leaf('linear')`.
+    '''
+    def __eq__(self, other):
+        return isinstance(other, Expr) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, self.form)
+
+    def __add__(self, other): return Operation('+', [self, other])
+    def __sub__(self, other): return Operation('-', [self, other])
+    def __mul__(self, other): return Operation('*', [self, other])
+    def __truediv__(self, other): return Operation('/', [self, other])
+
+    @property
+    def leaves(self):
+        '''Basic models of the tree, in the order of parameters.'''
+        return [leaf for child in self.children for leaf in child.leaves]
+
+    @property
+    def paras(self):
+        '''Names of parameters, except independent variable `x`.'''
+        return self._names(_Counter())
+
+    @property
+    def form(self):
+        '''The expression, e.g. 'gaussian(x, p0_0, p0_1, p0_2) + linear(x, p1_0, p1_1)'.'''
+        return self._form(_Counter())
+
+    def compile(self, functionName=None):
+        '''Compile the tree to a model. See `compileExpr`.'''
+        return compileExpr(self, functionName)
+
+class _Counter:
+    '''Running indices of leaves and piecewise nodes while walking a tree, to name parameters.'''
+    def __init__(self):
+        self.leaf = 0
+        self.piecewise = 0
+
+class Leaf(Expr):
+    '''A basic model.
+
+    Parameters:
+        name: name of basic model
+            Type: string
+    '''
+    def __init__(self, name):
+        if name not in basicModels_dict:
+            raise ValueError('Error -- "%s" is not a basic model' % name)
+        self.name = name
+        self.n_para = basicModels_dict[name]['n_para']
+        self.key = ('leaf', name)
+
+    @property
+    def leaves(self):
+        return [self]
+
+    def _names(self, counter):
+        names = ['p%d_%d' % (counter.leaf, j) for j in range(self.n_para)]
+        counter.leaf += 1
+        return names
+
+    def _form(self, counter):
+        return '%s(x, %s)' % (self.name, ', '.join(self._names(counter)))
+
+    def _evaluator(self, offset):
+        model, paras = basicModels_dict[self.name]['model'], slice(offset, offset+self.n_para)
+        def ev(x, p):
+            return model(x, *p[paras])
+        return ev
+
+class Operation(Expr):
+    '''An arithmetic operation between nodes, evaluated from left to right (from right to left for '**', as python does).
+    Nested operations of the same associative operator are flattened, e.g. (a + b) + c is a + b + c.
+
+    Parameters:
+        operator: one of '+', '-', '*', '/' and '**'
+            Type: string
+        children: operands
+            Type: list of Expr
+    '''
+    ufuncs = {'+':np.add, '-':np.subtract, '*':np.multiply, '/':np.true_divide, '**':np.power}
+
+    def __init__(self, operator, children):
+        if operator not in self.ufuncs:
+            raise ValueError('Error -- "operator" must be one of %s or "piecewise"' % list(self.ufuncs))
+        if len(children) < 2:
+            raise ValueError('Error -- an operation needs 2 operands at least')
+        flat = []
+        for i, child in enumerate(children):
+            #a + (b + c) == a + b + c, but a - (b - c) != a - b - c
+            if isinstance(child, Operation) and child.operator == operator and (operator in ('+', '*') or (i == 0 and operator != '**')):
+                flat.extend(child.children)
+            else:
+                flat.append(child)
+        self.operator = operator
+        self.children = tuple(flat)
+        self.n_para = sum(child.n_para for child in self.children)
+        self.key = ('operation', operator, tuple(child.key for child in self.children))
+
+    def _names(self, counter):
+        return [name for child in self.children for name in child._names(counter)]
+
+    def _form(self, counter):
+        forms = ['(%s)' % child._form(counter) if isinstance(child, Operation) else child._form(counter) for child in self.children]
+        return (' %s ' % self.operator).join(forms)
+
+    def _evaluator(self, offset):
+        evs = []
+        for child in self.children:
+            evs.append(child._evaluator(offset))
+            offset += child.n_para
+        ufunc = self.ufuncs[self.operator]
+        if self.operator == '**':
+            def ev(x, p):
+                values = [e(x, p) for e in evs]
+                out = values.pop()
+                while values:
+                    out = ufunc(values.pop(), out)
+                return out
+            return ev
+        first, rest = evs[0], evs[1:]
+        def ev(x, p):
+            out = first(x, p)
+            for e in rest:
+                out = _accumulate(ufunc, out, e(x, p))
+            return out
+        return ev
+
+    def _numexpr(self, counter):
+        '''The expression for numexpr over values of leaves, named v0, v1, ...'''
+        terms = []
+        for child in self.children:
+            if isinstance(child, Operation):
+                terms.append('(%s)' % child._numexpr(counter))
+            else:
+                terms.append('v%d' % counter.leaf)
+                counter.leaf += 1
+        return (' %s ' % self.operator).join(terms)
+
+class Piecewise(Expr):
+    '''A piecewise function of k pieces split at k-1 breakpoints, the same as models of `funcParasExpr`: x < x0 by the first node, x0 <= x < x1 by the second one, ..., and else by the last one.
+    Breakpoints are taken in increasing order, i.e. a breakpoint less than a former one makes an empty piece.
+
+    Parameters:
+        children: the pieces, 2 at least
+            Type: list of Expr
+        continuous: if True, pieces are shifted to meet each other at breakpoints, the first two at (x0, y0), and the parameters start with `x0, x1, ..., y0`. Otherwise, with the breakpoints only.
+            Type: boolean
+            Default: True
+    '''
+    def __init__(self, children, continuous=True):
+        if len(children) < 2:
+            raise ValueError('Error -- a piecewise function needs 2 pieces at least')
+        self.children = tuple(children)
+        self.continuous = bool(continuous)
+        self.n_breaks = len(self.children) - 1
+        self.n_para = self.n_breaks + self.continuous + sum(child.n_para for child in self.children)
+        self.key = ('piecewise', self.continuous, tuple(child.key for child in self.children))
+
+    def _split(self, counter):
+        names = ['x%d' % i for i in range(self.n_breaks)] + ['y0'][:self.continuous]
+        if counter.piecewise:
+            names = ['%s_%d' % (name, counter.piecewise) for name in names]
+        counter.piecewise += 1
+        return names
+
+    def _names(self, counter):
+        return self._split(counter) + [name for child in self.children for name in child._names(counter)]
+
+    def _form(self, counter):
+        split = self._split(counter)
+        pieces = [child._form(counter) for child in self.children]
+        conditions = ['x < %s: %s' % (x, piece) for x, piece in zip(split[:self.n_breaks], pieces)]
+        return 'piecewise(%s; else: %s)' % ('; '.join(conditions), pieces[-1]) + (' meeting at (%s, %s)' % (split[0], split[-1]) if self.continuous else '')
+
+    def _evaluator(self, offset):
+        n_breaks, continuous = self.n_breaks, self.continuous
+        pieces = []
+        start = offset + n_breaks + continuous
+        for child in self.children:
+            pieces.append(child._evaluator(start))
+            start += child.n_para
+        paras = slice(offset, offset+self.n_para)
+        def shifts(breaks, p):
+            '''Constants added to pieces to meet at breakpoints, chained from (x0, y0).'''
+            if not continuous:
+                return [0.0] * len(pieces)
+            y0 = p[offset+n_breaks]
+            c = [y0 - pieces[0](breaks[0], p), y0 - pieces[1](breaks[0], p)]
+            for i in range(2, len(pieces)):
+                c.append(pieces[i-1](breaks[i-1], p) + c[i-1] - pieces[i](breaks[i-1], p))
+            return c
+        def ev(x, p):
+            x = np.asarray(x)
+            if any(np.ndim(v) for v in p[paras]):
+                #parameters in arrays, e.g. many fits at once, so evaluate all pieces everywhere
+                breaks = list(np.maximum.accumulate(np.broadcast_arrays(*p[offset:offset+n_breaks])))
+                with np.errstate(all='ignore'):
+                    c = shifts(breaks, p)
+                    out = pieces[-1](x, p) + c[-1]
+                    for i in reversed(range(n_breaks)):
+                        out = np.where(x < breaks[i], pieces[i](x, p) + c[i], out)
+                return out
+            breaks = _increasing(p[offset:offset+n_breaks])
+            c = shifts(breaks, p)
+            out = np.empty(x.shape)
+            #evaluate pieces on their own part only, contiguous slices if `x` is sorted
+            for index, e, shift in zip(segmentIndex(x, breaks), pieces, c):
+                out[index] = e(x[index], p)
+                if continuous: out[index] += shift
+            return out
+        return ev
+
+def _increasing(breaks):
+    '''Breakpoints as floats made non-decreasing by their running max, where nan is kept.'''
+    out, top = [], -np.inf
+    for b in breaks:
+        b = float(b)
+        top = b if (b != b or top != top or b > top) else top
+        out.append(top)
+    return out
+
+def segmentIndex(x, breaks):
+    '''Index pieces of `x` split at increasing `breaks`, where piece i is breaks[i-1] <= x < breaks[i]. If `x` is sorted (e.g. by `_fitModel` for
+    piecewise models), pieces are contiguous slices located by binary search, which index without copying. Otherwise, they are boolean masks.
+
+    Parameters:
+        x: the independent variable
+            Type: numpy.ndarray
+        breaks: breakpoints in increasing order
+            Type: list or numpy.ndarray
+    Returns:
+        index: an index of every piece, `len(breaks) + 1` in total
+            Type: list of slices or numpy.ndarray
+    '''
+    if x.ndim == 1 and all(b == b for b in breaks) and (x.size < 2 or (x[1:] >= x[:-1]).all()):
+        ends = [0, *x.searchsorted(breaks).tolist(), x.size]
+        return [slice(a, b) for a, b in zip(ends[:-1], ends[1:])]
+    index = []
+    rest = np.ones(x.shape, dtype=bool)
+    for b in breaks:
+        mask = rest & (x < b)
+        rest &= ~mask
+        index.append(mask)
+    index.append(rest)
+    return index
+
+def _accumulate(ufunc, out, value):
+    '''Do `ufunc(out, value)`, in place if `out` is a float array in the shape of the result, to save an intermediate array.'''
+    if isinstance(out, np.ndarray) and out.dtype == np.float64 and out.flags.writeable and \
+            (np.shape(value) == out.shape or np.broadcast_shapes(out.shape, np.shape(value)) == out.shape):
+        return ufunc(out, value, out=out)
+    return ufunc(out, value)
+
+def modelExpr(functions, operator='+'):
+    '''The expression tree of a composite model of `generateFunction`.
+
+    Parameters:
+        functions: basic models(name of models) to concatenate/mix.
+            Type: list of string
+        operator: one of '+', '-', '*', '/', '**' and 'piecewise'. A piecewise function is continuous unless all pieces are constant.
+            Type: string
+            Default: '+'
+    Returns:
+        expr: the tree
+            Type: Expr
+    '''
+    leaves = [Leaf(function) for function in functions]
+    if 'PIECEWISE' in operator.upper():
+        return Piecewise(leaves, continuous=not all(function == 'constant' for function in functions))
+    return Operation(operator, leaves)
+
+@lru_cache(maxsize=8192)
+def _evaluator(expr):
+    '''Compile a tree to a function in form of f(x, p), cached by structure of the tree.'''
+    ev = expr._evaluator(0)
+    if numexpr is None or not isinstance(expr, Operation) or any(isinstance(node, Piecewise) for node in _walk(expr)):
+        return ev
+    #fuse the arithmetic between basic models into one pass for large data
+    leaves = [leaf._evaluator(offset) for leaf, offset in zip(expr.leaves, np.cumsum([0] + [leaf.n_para for leaf in expr.leaves]))]
+    formula = expr._numexpr(_Counter())
+    def fused(x, p):
+        if np.size(x) < NUMEXPR_MIN_SIZE:
+            return ev(x, p)
+        return numexpr.evaluate(formula, local_dict={'v%d' % i: leaf(x, p) for i, leaf in enumerate(leaves)})
+    return fused
+
+def _walk(expr):
+    yield expr
+    for child in getattr(expr, 'children', ()):
+        yield from _walk(child)
+
+def compileExpr(expr, functionName=None):
+    '''Compile an expression tree to a model in form of f(x, p0_0, p0_1, ...), without generating and exec'ing source code.
+    The evaluator is shared by all structurally equal trees, and the arithmetic between basic models is done in place.
+    If numexpr is installed, it's fused into one pass for data of `NUMEXPR_MIN_SIZE` points at least.
+
+    Parameters:
+        expr: the tree
+            Type: Expr
+        functionName: the name of model. If None, named as `generateFunction` does.
+            Type: string
+            Default: None
+    Returns:
+        model: the model, with attribute `expr`, the tree
+            Type: function object
+    '''
+    ev = _evaluator(expr)
+    def model(x, *p):
+        return ev(x, p)
+    if not functionName:
+        prefix = 'piecewise_' if isinstance(expr, Piecewise) else ('' if isinstance(expr, Leaf) else 'operation_')
+        functionName = prefix + '_'.join(leaf.name for leaf in expr.leaves)
+    model.__name__ = model.__qualname__ = functionName
+    #signature, so `funcArgs` counts parameters as for the basic models
+    model.__signature__ = inspect.Signature([inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD) for name in ['x'] + expr.paras])
+    model.expr = expr
+    return model
@@ -0,0 +1,139 @@
+#Incremental curve-fitting -- refit a growing series by warm starts, and search all models again only when the ranking may change
+
+import numpy as np
+
+from .longscurvefitting import generateModels, fitModels
+from .models import basicModels_nameList
+
+def _mse(row):
+    '''Cost per point, which compares rows fitted on different sizes of data.'''
+    return row['cost'] / row['points']
+
+class IncrementalFitter:
+    '''A stateful fitter of a series which grows by appended chunks. It keeps the potential models, their last parameters and the ranking.
+    After appending, only the best `top` models are refitted, warm-started from their last parameters. All models are searched again
+    (warm-started as well) only if the ranking may change: any of them fails, the former best one gets worse than the new best one or than
+    itself before by `tolerance`, the data grows by `growth` times since the last search, or the potential models change.
+
+    Parameters:
+        functions, piecewise, operator, maxCombination: the same as `generateModels`
+        top: the number of models refitted after appending
+            Type: integer
+            Default: 10
+        tolerance: relative increase of cost per point to search all models again
+            Type: float
+            Default: 0.2
+        growth: search all models again when the data grows by these times since the last search
+            Type: float
+            Default: 2.0
+        n_jobs, executor: the same as `fitModels`
+        kwargs: keyword arguments passed to `fitModels` and `curve_fit_m`
+            Type: dict
+    '''
+    def __init__(self, functions=basicModels_nameList, piecewise=False, operator='+', maxCombination=2, top=10, tolerance=0.2, growth=2.0, n_jobs=1, executor=None, **kwargs):
+        self.options = {'functions':functions, 'piecewise':piecewise, 'operator':operator, 'maxCombination':maxCombination}
+        self.top, self.tolerance, self.growth = top, tolerance, growth
+        self.n_jobs, self.executor = n_jobs, executor
+        if 'method' not in kwargs: kwargs['method'] = 'trf'		#the same as `oneClickCurveFitting`
+        kwargs.pop('p0', None)
+        kwargs.pop('full_output', None)
+        self.kwargs = kwargs
+        self.size = 0
+        self._x, self._y = np.empty(0), np.empty(0)
+        self.candidates = generateModels(dataLength=np.inf, **self.options)    #all potential models, generated once
+        self.models = []        #potential models for the size of data
+        self.parameters = {}    #modelname -> last parameters
+        self.report = []        #rows of the latest fit of every model, ranked by cost per point
+        self.searches = 0       #number of searches over all models
+        self.refits = 0         #number of refits of the top models only
+        self._searched_size = 0
+
+    @property
+    def xdata(self):
+        return self._x[:self.size]
+
+    @property
+    def ydata(self):
+        return self._y[:self.size]
+
+    @property
+    def best(self):
+        '''The best model and its parameters, as `oneClickCurveFitting` returns with `feedback=True`.'''
+        if not self.report:
+            raise ValueError('Error -- no model is fitted yet')
+        row = self.report[0]
+        return next(m['model'] for m in self.models if m['name'] == row['modelname']), row['parameters']
+
+    def append(self, xdata, ydata):
+        '''Append a chunk of data and refit.
+
+        Parameters:
+            xdata, ydata: the chunk
+                Type: array_like
+        Returns:
+            report: the ranking. See `refit`.
+                Type: list of dictionaries
+        '''
+        xdata, ydata = np.asarray(xdata, dtype=float).reshape(-1), np.asarray(ydata, dtype=float).reshape(-1)
+        if xdata.size != ydata.size:
+            raise ValueError('Error -- "xdata" and "ydata" must be in the same size')
+        size = self.size + xdata.size
+        if size > self._x.size:
+            #grow by doubling, so appending is amortized O(1) per point
+            capacity = max(size, 2 * self._x.size)
+            self._x, self._y = [np.concatenate([a[:self.size], np.empty(capacity - self.size)]) for a in (self._x, self._y)]
+        self._x[self.size:size], self._y[self.size:size] = xdata, ydata
+        self.size = size
+        return self.refit()
+
+    def refit(self, full=None):
+        '''Refit the models on all data so far.
+
+        Parameters:
+            full: True to search all models, False to refit the top models only (all models if none is fitted yet), or None to decide as described in the class
+                Type: boolean
+                Default: None
+        Returns:
+            report: rows of the latest fit of every model, ranked by cost per point. Rows carry 'points', the number of points the model is fitted on,
+                and only the top ones are fitted on all data unless all models are searched.
+                Type: list of dictionaries
+        '''
+        if self.size == 0:
+            raise ValueError('Error -- no data to fit')
+        models = self.candidates
+        if self.size <= 20:	#the same rule of `generateModels`
+            models = [m for m in models if 'PIECEWISE' not in m['operator'].upper()]
+        if len(models) != len(self.models):
+            self.models, full = models, True
+        if not self.report:
+            full = True     #nothing to refit, e.g. all fits failed
+        elif full is None:
+            full = self.size >= self.growth * self._searched_size
+        if not full:
+            top, rest = self.report[:self.top], self.report[self.top:]
+            rows = self._fit([m for m in self.models if m['name'] in {row['modelname'] for row in top}])
+            if self._stable(top, rows):
+                self.refits += 1
+                self.report = sorted(rows + rest, key=_mse)
+                return self.report
+        self.searches += 1
+        self._searched_size = self.size
+        self.report = sorted(self._fit(self.models), key=_mse)
+        return self.report
+
+    def _fit(self, models):
+        '''Fit models warm-started from their last parameters, and keep the new ones.'''
+        candidates = [dict(m, p0=self.parameters.get(m['name'])) for m in models]
+        rows = fitModels(candidates, self.xdata, self.ydata, n_jobs=self.n_jobs, executor=self.executor, silent=True, **self.kwargs)
+        for row in rows:
+            row['points'] = self.size
+            self.parameters[row['modelname']] = row['parameters']
+        return rows
+
+    def _stable(self, top, rows):
+        '''If the ranking is unlikely to change, judged by the former best model among the refitted top models.'''
+        if len(rows) < len(top):
+            return False
+        mse = {row['modelname']: _mse(row) for row in rows}
+        former = mse[top[0]['modelname']]
+        return former <= (1 + self.tolerance) * min(mse.values()) and former <= (1 + self.tolerance) * _mse(top[0])
@@ -0,0 +1,157 @@
+#Optional Numba kernels of basic models -- JIT-compiled ufuncs, which evaluate a model in one pass over data without intermediate arrays
+
+import math
+import importlib.util
+
+import numpy as np
+
+#kernels in use, by name of basic model. Basic models dispatch to them if it's not empty. See `useNumba`.
+active = {}
+#if kernels are chosen, by `useNumba` or by `autoNumba` on the first fit
+_chosen = False
+
+'''
+Scalar versions of basic models, the same as the NumPy ones in `models`, which are compiled to ufuncs by Numba.
+Ufuncs broadcast as the NumPy ones, and Numba ufuncs follow NumPy on errors (nan or inf instead of exceptions).
+'''
+def constant(x, a):
+    return a
+
+def linear(x, a, b):
+    return a * x + b
+
+def quadratic(x, a, b, c):
+    return a * x**2 + b * x + c
+
+def cubic(x, a, b, c, d):
+    return a * x**3 + b * x**2 + c * x + d
+
+def gaussian(x, a, b, c):
+    return a * math.exp(-(x-b)**2 / (2*c**2))
+
+def erf(x, a, b, c):
+    return a * math.erf((x-b) / c)
+
+def cauchy(x, a, b, c):
+    if not c > 0: return math.nan
+    u = (x-b) / c
+    return a / (math.pi * (1 + u*u) * c)
+
+def pearson3_pdf(z, skew):
+    '''Standard pdf of Pearson type III distribution, the same as `models._pearson3_pdf`, which is also used by the Jacobian.'''
+    if not math.isfinite(skew) or math.isnan(z): return math.nan
+    if abs(skew) < 0.000016:
+        return math.exp(-z*z/2) / math.sqrt(2*math.pi)
+    beta = 2.0 / skew
+    alpha = beta*beta
+    t = beta * (z + alpha/beta)
+    if t < 0 or (t == 0 and alpha > 1): return 0.0
+    if t == 0: return abs(beta) if alpha == 1 else math.inf
+    p = math.exp(math.log(abs(beta)) + ((alpha-1)*math.log(t) - t - math.lgamma(alpha)))
+    return 0.0 if math.isnan(p) else p
+
+def pearson3(x, a, b, c, d):
+    if not d > 0: return math.nan
+    return a * pearson3_pdf((x-c) / d, b) / d     #the njit-compiled one when compiled, see `useNumba`
+
+def exponential(x, a, b):
+    return a * b ** x
+
+def logarithm(x, a, b):
+    if b == 1: b = b + 0.001
+    return a * math.log(x) / math.log(b) if x >= 0 and b >= 0 else math.nan
+
+def logistic(x, a, b, c):
+    t = b*x + c
+    #the same as `scipy.special.expit`, without overflow
+    return a / (1 + math.exp(-t)) if t >= 0 else a * math.exp(t) / (1 + math.exp(t))
+
+def reciprocal(x, a, b):
+    return 1 / (a * x + b)
+
+def power_law(x, a, b):
+    return a * x ** b
+
+_scalars = {f.__name__: f for f in (constant, linear, quadratic, cubic, gaussian, erf, cauchy, pearson3, exponential, logarithm, logistic, reciprocal, power_law)}
+_compiled = {}
+
+def _numba():
+    '''Import Numba on demand, so importing the package doesn't pay for it. None if it's not installed.'''
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba
+
+def autoNumba():
+    '''Switch basic models to Numba kernels on the first fit if Numba is installed, unless `useNumba` is called before. It's called by `curve_fit_m` and `curve_fit_batch`.'''
+    if not _chosen:
+        useNumba(importlib.util.find_spec('numba') is not None)
+
+def useNumba(enable=True):
+    '''Switch basic models to Numba kernels, or back to NumPy. By default kernels are used from the first fit on if Numba is installed (see `autoNumba`),
+    so Numba is imported then and not with the package, and `useNumba(False)` opts out. Kernels are compiled on their first calls, and cached on disk.
+
+    Parameters:
+        enable: use Numba kernels or not
+            Type: boolean
+            Default: True
+    Returns:
+        enabled: if Numba kernels are used, which is False if Numba is not installed
+            Type: boolean
+    '''
+    global pearson3_pdf, _chosen
+    _chosen = True
+    active.clear()
+    numba = _numba() if enable else None
+    if numba is not None:
+        if not _compiled:
+            _compiled['pearson3_pdf'] = numba.vectorize(cache=True)(pearson3_pdf)
+            pearson3_pdf = numba.njit(cache=True)(pearson3_pdf)     #called by the kernel of pearson3
+            _compiled.update({name: numba.vectorize(cache=True)(f) for name, f in _scalars.items()})
+        active.update(_compiled)
+    return bool(active)
+
+def verifyKernels(size=1000, seed=0):
+    '''Compare Numba kernels with the NumPy basic models on random data and parameters, including invalid ones.
+
+    Parameters:
+        size: number of random points
+            Type: integer
+            Default: 1000
+        seed: seed of random numbers
+            Type: integer
+            Default: 0
+    Returns:
+        errors: max relative error of each model where both are finite, or inf if they disagree on nan or inf. Empty if Numba is not installed.
+            Type: dictionary
+    '''
+    global _chosen
+    from .models import basicModels
+    enabled, chosen = bool(active), _chosen
+    rng = np.random.default_rng(seed)
+    x = np.concatenate([rng.normal(0, 5, size), [0.0, 1.0, -1.0, np.nan, np.inf, -np.inf]])
+    errors = {}
+    try:
+        for m in basicModels:
+            if not useNumba(): return {}
+            kernel = active[m['name']]
+            error = 0.0
+            for _ in range(20):
+                p = rng.normal(0, 2, m['n_para'])
+                p[rng.random(p.size) < 0.1] = 0.0
+                useNumba(False)
+                with np.errstate(all='ignore'):
+                    expected = np.broadcast_to(m['model'](x, *p), x.shape)
+                    actual = kernel(x, *p)
+                if not np.array_equal(np.isnan(expected), np.isnan(actual)) or not np.array_equal(np.isinf(expected), np.isinf(actual)):
+                    error = np.inf
+                finite = np.isfinite(expected) & np.isfinite(actual)
+                if finite.any():
+                    scale = np.maximum(np.absolute(expected[finite]), np.finfo(float).tiny)
+                    error = max(error, np.max(np.absolute(actual[finite] - expected[finite]) / scale))
+            errors[m['name']] = error
+    finally:
+        useNumba(enabled)
+        _chosen = chosen
+    return errors
@@ -1,22 +1,34 @@
 import numpy as np
 import pathlib
 import time
+import os
+from itertools import repeat, combinations_with_replacement
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
-from .scipycurvefitm import curve_fit_m
+from .scipycurvefitm import curve_fit_m, prepare_bounds, FitTimeout
 from .models import *
-from .models import __custom
-from ._helpers import ( curve_fit_plot,
-                        writeLogsDicts2csv,
+from .expressions import modelExpr, compileExpr, _evaluator, Piecewise, segmentIndex, _increasing
+from .reports import openReport
+from .sampling import asData, checkFinite, subsampleData, subsampleIndex, binData
+from ._helpers import ( plotModels, resolveJobs,
                         funcArgs,
                         funcArgsNr )
 
+#max number of composite models kept by the model registry, the least recently used ones are evicted
+MODEL_CACHE_SIZE = 8192
+
+#statuses of rows of report which carry fitted parameters, others ('failed' and 'timeout') have cost of inf
+FITTED_STATUSES = ('converged', 'max_nfev')
+
 def funcParasExpr(functions, operator='+'):
     '''Generate the expression of mixed function.
 
     Parameters:
         functions: basic models(name of models) to concatenate/mix.
             Type: list of string
-        operator: arithmetic operation between basic models. If it's assined as 'piecewise', then compose a 2-piecewise function by basic models.
+        operator: arithmetic operation between basic models. If it's assined as 'piecewise', then compose a piecewise function by basic models, a piece per model.
             Type: string
             Default: '+'
     returns:
@@ -36,7 +48,7 @@ def funcParasExpr(functions, operator='+'):
             return gaussian(x, a1, b1, c1) + gaussian_erf(x, a2, b2, c2)
         '''
         for i, function in enumerate(functions):
-            model = next(m for m in basicModels if m['name'] == function)
+            model = basicModels_dict[function]
             parameters = ['p%d_%d' % (i, j) for j in range(model['n_para'])]
             para_expr = ', '.join(parameters)
             function_expr = '%s(x, %s)' % (function, para_expr)
@@ -45,9 +57,13 @@ def funcParasExpr(functions, operator='+'):
         mixed_function = (' %s ' % operator).join(functions_expr)
         mixed_parameters = ','.join(parameters_expr)
         return mixed_function, mixed_parameters
+    elif len(functions) > 2:
+        #more than 2 pieces, in the form of the expression tree. See `expressions.Piecewise`.
+        expr = modelExpr(functions, operator=operator)
+        return expr.form, ','.join(expr.paras)
     else:                                                                                           
         '''
-        #only for 2-piecewise function
+        #2-piecewise function
         #an example of custom piecewise function
         
         #model-1 --primary
@@ -63,7 +79,7 @@ def funcParasExpr(functions, operator='+'):
         modelcode = 'm-2'	if functions[0] == functions[1] == 'constant' else 'm-1'
         if len(functions) == 2:
             for i, function in enumerate(functions):
-                model = next(m for m in basicModels if m['name'] == function)
+                model = basicModels_dict[function]
                 parameters = ['p%d_%d' % (i, j) for j in range(model['n_para'])]
                 para_expr = ', '.join(parameters)
                 if modelcode == 'm-1':
@@ -81,6 +97,292 @@ def funcParasExpr(functions, operator='+'):
             mixed_function = 'np.piecewise(x, [x < x0], [' + ','.join(functions_expr) + '])'
             return mixed_function, mixed_parameters
 
+def _concatColumns(*columns):
+    '''Concatenate blocks of columns along the last axis, with broadcasting the leading axes.'''
+    shape = np.broadcast_shapes(*[np.shape(c)[:-1] for c in columns])
+    return np.concatenate([np.broadcast_to(c, shape + np.shape(c)[-1:]) for c in columns], axis=-1)
+
+def funcJac(functions, operator='+'):
+    '''Synthesise the Jacobian of mixed function from the analytic Jacobians of basic models, in the same parameters order of `funcParasExpr`.
+
+    Parameters:
+        functions: basic models(name of models) to concatenate/mix.
+            Type: list of string
+        operator: one of '+', '-', '*', '/' and 'piecewise'.
+            Type: string
+            Default: '+'
+    returns:
+        jac: the function to calculate derivatives in shape of (..., x.size, n_para), or None if the operator is not supported.
+            The Jacobian of a piecewise function only takes scalar parameters.
+            Type: function object
+    '''
+    models = [basicModels_dict[function] for function in functions]
+    splits = np.cumsum([model['n_para'] for model in models])[:-1]
+    if 'PIECEWISE' in operator.upper():
+        return _piecewiseJac(models, continuous=not all(function == 'constant' for function in functions))
+    if operator not in ('+', '-', '*', '/'): return None
+
+    def jac(x, *p):
+        paras = np.split(p, splits)
+        jacs = [model['jac'](x, *para) for model, para in zip(models, paras)]
+        if operator in ('+', '-'):
+            if operator == '-': jacs = [jacs[0]] + [-j for j in jacs[1:]]
+            return _concatColumns(*jacs)
+        values = [model['model'](x, *para)[..., None] for model, para in zip(models, paras)]
+        if operator == '*':
+            jacs = [j * np.prod([v for k, v in enumerate(values) if k != i], axis=0) for i, j in enumerate(jacs)]
+        else:
+            denominator = np.prod(values[1:], axis=0)
+            y = values[0] / denominator
+            jacs = [jacs[0] / denominator] + [-j * y / v for j, v in zip(jacs[1:], values[1:])]
+        return _concatColumns(*jacs)
+    return jac
+
+def _derivative(f, x, p):
+    '''Derivative of a basic model with respect to `x`, by central differences in one call.'''
+    h = 1e-6 * max(1, abs(x))
+    lower, upper = f(np.array([x-h, x+h]), *p)
+    return (upper - lower) / (2*h)
+
+def _piecewiseJac(models, continuous=True):
+    '''The Jacobian of a piecewise function of `expressions.Piecewise`, filled piece by piece on their own part of `x`. See `funcJac`.'''
+    fs, js = [model['model'] for model in models], [model['jac'] for model in models]
+    n_breaks = len(models) - 1
+    offsets = np.cumsum([n_breaks + continuous] + [model['n_para'] for model in models])
+    def jac(x, *p):
+        x = np.asarray(x, dtype=float)
+        breaks = _increasing(p[:n_breaks])
+        paras = [p[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        J = np.zeros(x.shape + (offsets[-1],))
+        index = segmentIndex(x, breaks)
+        for i, (s, j, para) in enumerate(zip(index, js, paras)):
+            J[s, offsets[i]:offsets[i+1]] = j(x[s], *para)
+        if not continuous:
+            return J
+        #piece i is shifted to meet the former one at its anchor, so it's derived by (x0, y0) and the former pieces
+        anchors = [breaks[0]] + list(breaks)
+        J[..., n_breaks] = 1.0
+        for i, (s, j, para) in enumerate(zip(index, js, paras)):
+            if i >= 1 and i < n_breaks:
+                at_anchor, at_end = np.broadcast_to(j(np.array([anchors[i], breaks[i]]), *para), (2, offsets[i+1]-offsets[i]))
+                for later in index[i+1:]: J[later, offsets[i]:offsets[i+1]] += at_end - at_anchor
+            else:
+                at_anchor = j(anchors[i], *para).reshape(-1)
+            J[s, offsets[i]:offsets[i+1]] -= at_anchor
+        J[index[0], 0] = -_derivative(fs[0], breaks[0], paras[0])
+        for later in index[1:]: J[later, 0] = -_derivative(fs[1], breaks[0], paras[1])
+        for i in range(1, n_breaks):
+            dx = _derivative(fs[i], breaks[i], paras[i]) - _derivative(fs[i+1], breaks[i], paras[i+1])
+            for later in index[i+1:]: J[later, i] = dx
+        return J
+    return jac
+
+def piecewiseSparsity(model, xdata, bounds):
+    '''Sparsity structure of the Jacobian of a piecewise model for finite differences, see `jac_sparsity` of `scipy.optimize.least_squares`.
+    Breakpoints move during the fit, but within their bounds, so points below the lower bounds are always on the first piece and
+    points above the upper bounds are always on the last piece, and only points between them depend on all parameters.
+
+    Parameters:
+        model: a piecewise model generated by `generateFunction`
+            Type: function object
+        xdata: data to fit
+            Type: numpy.ndarray
+        bounds: bounds of parameters, e.g. by `getBounds`
+            Type: 2-tuple of array_like
+    Returns:
+        sparsity: the structure in the shape of (points, parameters), or None if the model is not piecewise or its breakpoints are unbounded
+            Type: numpy.ndarray of bool
+    '''
+    expr = getattr(model, 'expr', None)
+    if not isinstance(expr, Piecewise):
+        return None
+    n_breaks, continuous = expr.n_breaks, expr.continuous
+    lb, ub = [np.resize(np.asarray(b, dtype=float), expr.n_para) for b in bounds]
+    lo, hi = lb[:n_breaks].min(), ub[:n_breaks].max()
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        return None
+    offsets = np.cumsum([n_breaks + continuous] + [child.n_para for child in expr.children])
+    first, last = np.zeros(expr.n_para, dtype=bool), np.zeros(expr.n_para, dtype=bool)
+    first[offsets[0]:offsets[1]] = last[offsets[-2]:offsets[-1]] = True
+    first[0] = last[n_breaks-1] = True
+    if continuous:
+        #pieces are chained from (x0, y0), and the last one is shifted by all breakpoints and the pieces between
+        first[n_breaks] = last[:n_breaks+1] = last[offsets[1]:] = True
+    xdata = np.asarray(xdata, dtype=float).reshape(-1)
+    sparsity = np.ones((xdata.size, expr.n_para), dtype=bool)
+    sparsity[xdata < lo] = first
+    sparsity[xdata > hi] = last
+    return sparsity
+
+def scanBreakpoints(xdata, ydata, n_breaks=1, min_size=5):
+    '''Locate breakpoints of a piecewise linear fit to data by binary segmentation, i.e. split the piece which gains the most again and again.
+    A split is found by scanning all candidates at once: the sums of squared errors of lines on both sides of every candidate come from cumulative sums, so a scan is O(n) after sorting.
+
+    Parameters:
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        n_breaks: the number of breakpoints
+            Type: integer
+            Default: 1
+        min_size: min number of points of a piece
+            Type: integer
+            Default: 5
+    Returns:
+        breaks: breakpoints in increasing order, which may be fewer than `n_breaks` if pieces are too short to split
+            Type: list
+    '''
+    order = np.argsort(xdata, kind='stable')
+    x, y = np.asarray(xdata, dtype=float)[order], np.asarray(ydata, dtype=float)[order]
+    pieces, breaks = [(0, x.size)], []
+    for _ in range(n_breaks):
+        best = None
+        for a, b in pieces:
+            split = _scanSplit(x[a:b], y[a:b], min_size)
+            if split is not None and (best is None or split[0] > best[0]):
+                best = (split[0], a, b, a + split[1])
+        if best is None: break
+        _, a, b, i = best
+        pieces.remove((a, b))
+        pieces.extend([(a, i), (i, b)])
+        breaks.append((x[i-1] + x[i]) / 2)
+    return sorted(breaks)
+
+def _scanSplit(x, y, min_size):
+    '''The best split of sorted data into 2 lines, as (decrease of sum of squared errors, index of the first point of the right piece), or None.'''
+    n = x.size
+    if n < 2 * min_size: return None
+    x, y = x - x.mean(), y - y.mean()   #centered against cancellation
+    def sse(m, sx, sy, sxx, sxy, syy):
+        with np.errstate(all='ignore'):
+            vx = sxx - sx**2 / m
+            cov = sxy - sx * sy / m
+            return syy - sy**2 / m - np.where(vx > 1e-12 * np.maximum(sxx, 1e-300), cov**2 / vx, 0.0)
+    sums = [np.cumsum(v) for v in (np.ones(n), x, y, x*x, x*y, y*y)]
+    i = np.arange(min_size, n - min_size + 1)
+    left = [c[i-1] for c in sums]
+    right = [c[-1] - l for c, l in zip(sums, left)]
+    total = sse(*left) + sse(*right)
+    total[x[i-1] == x[i]] = np.inf    #a breakpoint must separate distinct x
+    if not np.isfinite(total).any(): return None
+    k = int(np.argmin(total))
+    return sse(*[c[-1] for c in sums]) - total[k], int(i[k])
+
+def funcGuess(functions, operator='+'):
+    '''Compose the initial guess of mixed function from the initial guesses of basic models, in the same parameters order of `funcParasExpr`.
+
+    For addition (substraction), the basic models are guessed one by one on the residual of the former ones. For multiplication and division, the first one is guessed on the data and the others are guessed as flat as possible around 1 by key 'flat' of basic models (or `p0` on ones). A basic model is guessed as ones, the default of `curve_fit_m`, if its guess is not finite somewhere, or zero somewhere for factors other than the first one. For a piecewise function, the basic models are guessed on their own pieces split at breakpoints by `scanBreakpoints` if all pieces are linear or constant, or quantiles of `x` if it fails. Pieces of other models are split at the scanned breakpoints, the quantiles, or (for a single breakpoint) deciles of `x`, whichever gives the lowest initial cost.
+
+    Parameters:
+        functions: basic models(name of models) to concatenate/mix.
+            Type: list of string
+        operator: arithmetic operation between basic models.
+            Type: string
+            Default: '+'
+    returns:
+        guess: the function to guess parameters in form of f(x, y) -> list
+            Type: function object
+    '''
+    models = [basicModels_dict[function] for function in functions]
+    if 'PIECEWISE' in operator.upper():
+        n_breaks = len(functions) - 1
+        #the scan fits piecewise linear segments, so it's trusted as it is for linear and constant pieces only
+        linear = all(function in ('constant', 'linear') for function in functions)
+        def guessAt(x, y, breaks):
+            paras = []
+            for index, model in zip(segmentIndex(x, breaks), models):
+                if x[index].size < 5: index = slice(None)
+                paras.extend(model['p0'](x[index], y[index]))
+            if all(function == 'constant' for function in functions):
+                return [*breaks, *paras]
+            return [*breaks, np.interp(breaks[0], np.sort(x), y[np.argsort(x)]), *paras]
+        def guess(x, y):
+            scanned = scanBreakpoints(x, y, n_breaks)
+            quantiles = list(np.quantile(x, np.arange(1, n_breaks+1) / (n_breaks+1)))
+            if len(scanned) < n_breaks:
+                return guessAt(x, y, quantiles)
+            if linear:
+                return guessAt(x, y, scanned)
+            #otherwise start from the breakpoints of the lowest initial cost, among the scanned ones, the quantiles, and deciles of `x` for a single breakpoint
+            candidates = [scanned, quantiles]
+            if n_breaks == 1: candidates += [[b] for b in np.quantile(x, np.arange(1, 10) / 10)]
+            model = generateFunction(list(functions), operator=operator)['model']
+            def cost(p):
+                with np.errstate(all='ignore'):
+                    c = np.sum((model(x, *p) - y)**2)
+                return c if np.isfinite(c) else np.inf
+            return min((guessAt(x, y, breaks) for breaks in candidates), key=cost)
+        return guess
+
+    def guess(x, y):
+        paras = []
+        residual = y
+        for i, model in enumerate(models):
+            factor = i and operator not in ('+', '-')
+            sign = -1 if (i and operator == '-') else 1
+            if factor:
+                para = model['flat'](x) if 'flat' in model else model['p0'](x, np.ones(x.size))
+            else:
+                para = model['p0'](x, sign * residual)
+            with np.errstate(all='ignore'):
+                value = model['model'](x, *para)
+            if not np.all(np.isfinite(value)) or (factor and not np.all(value != 0)):
+                para = np.ones(model['n_para'])    #the default of `curve_fit_m`
+                with np.errstate(all='ignore'):
+                    value = model['model'](x, *para)
+            if not factor: residual = residual - sign * value
+            paras.extend(para)
+        return paras
+    return guess
+
+def funcLinear(functions, operator='+'):
+    '''Indices of parameters of mixed function which enter linearly, jointly, in the same parameters order of `funcParasExpr`.
+
+    For addition (substraction), they are linear parameters of all basic models. For multiplication and division, only that of the first basic model. For a piecewise function, that of all pieces, except the bounded breakpoints and `y0`.
+
+    Parameters:
+        functions: basic models(name of models) to concatenate/mix.
+            Type: list of string
+        operator: arithmetic operation between basic models.
+            Type: string
+            Default: '+'
+    returns:
+        linear: indices of linear parameters
+            Type: tuple
+    '''
+    models = [basicModels_dict[function] for function in functions]
+    offsets = np.cumsum([0] + [model['n_para'] for model in models])
+    if 'PIECEWISE' in operator.upper():
+        shift = len(functions) - 1 + (not all(function == 'constant' for function in functions))
+        return tuple(int(shift + offset + i) for model, offset in zip(models, offsets) for i in model['linear'])
+    if operator in ('+', '-'):
+        return tuple(int(offset + i) for model, offset in zip(models, offsets) for i in model['linear'])
+    return tuple(models[0]['linear'])
+
+def getInitialGuess(model, xdata, ydata, bounds=(-np.inf, np.inf)):
+    '''Guess the initial parameters of a model from data, which is feasible to `bounds`.
+
+    Parameters:
+        model: the model carries attribute `p0`, a function in form of f(x, y) -> list. All in-house models do.
+            Type: function object
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        bounds: lower and upper bounds on parameters
+            Type: 2-tuple of array_like
+            Default: (-np.inf, np.inf)
+    Returns:
+        p0: initial parameters, or None if it fails to guess
+            Type: numpy.ndarray
+    '''
+    try:
+        with np.errstate(all='ignore'):
+            p0 = np.asarray(model.p0(np.asarray(xdata, dtype=float), np.asarray(ydata, dtype=float)), dtype=float)
+    except Exception:
+        return None
+    if p0.size != funcArgsNr(model)-1: return None
+    p0[~np.isfinite(p0)] = 1.0
+    lb, ub = prepare_bounds(bounds, p0.size)
+    return np.clip(p0, lb, ub)
+
 def getBounds(model, xdata, ydata):
     '''An uncomplete attemp to assign bounds to parameters.
 
@@ -98,12 +400,15 @@ def getBounds(model, xdata, ydata):
     modelname = model.__name__
     narguments = funcArgsNr(model)-1 #except independent variable
     if modelname.startswith('piecewise'):
+        expr = getattr(model, 'expr', None)
+        n_breaks = expr.n_breaks if isinstance(expr, Piecewise) else 1
         index_l = max(9, int(0.05 * xdata.size))
-        index_r = min(-10, -int(0.05 * xdata.size))
-        x0_bound_l, x0_bound_r = np.sort(xdata)[index_l], np.sort(xdata)[index_r]
-        y0_bound_l, y0_bound_r = np.sort(ydata)[index_l], np.sort(ydata)[index_r]
-        bound_l = [x0_bound_l, y0_bound_l, *[-np.inf]*(narguments-2)]
-        bound_r = [x0_bound_r, y0_bound_r, *[np.inf]*(narguments-2)]
+        index_r = xdata.size + min(-10, -int(0.05 * xdata.size))
+        #only 2 order statistics are needed, so partition instead of sorting
+        x0_bound_l, x0_bound_r = np.partition(xdata, (index_l, index_r))[[index_l, index_r]]
+        y0_bound_l, y0_bound_r = np.partition(ydata, (index_l, index_r))[[index_l, index_r]]
+        bound_l = [*[x0_bound_l]*n_breaks, y0_bound_l, *[-np.inf]*(narguments-n_breaks-1)]
+        bound_r = [*[x0_bound_r]*n_breaks, y0_bound_r, *[np.inf]*(narguments-n_breaks-1)]
         bounds = (bound_l, bound_r)
     else:
         bounds = (-np.inf, np.inf)
@@ -122,31 +427,158 @@ def generateFunction(functions, functionName=None, operator='+'):
             Type: string
             Default: '+'
     Returns:
-        modelMeta: the generated model, include keys: 'model'(function object),'name','form', and 'paras_symbol'
+        modelMeta: the generated model, include keys: 'model'(function object),'name','form','paras_symbol', and the specification 'functions' and 'operator' to rebuild it
             Type: dictionary
     '''
     if isinstance(functions, str): functions = [functions]
 
     if len(functions) == 1 and functions[0] in basicModels_nameList:
         functionName = functions[0]		#ignore argument `functionName`
-        model = next(m['model'] for m in basicModels if m['name'] == functionName)
+        model = basicModels_dict[functionName]['model']
         paras_symbol = ','.join(funcArgs(model)[1:])	#string, equivalent to `mixParas`
-        modelMeta = {'model':model,'name':functionName,'form':'Default','paras_symbol':paras_symbol}
+        modelMeta = {'model':model,'name':functionName,'form':'Default','paras_symbol':paras_symbol,
+                    'functions':list(functions),'operator':operator}
         
     if len(functions) >= 2:
         if not functionName:
             prefix = 'piecewise_' if 'PIECEWISE' in operator.upper() else 'operation_'
             functionName = prefix + '_'.join(functions)
         
-        mixFunc, mixParas = funcParasExpr(functions, operator=operator)
-        # create an namespace
-        ns = {}
-        exec(__custom % (functionName, mixParas, mixFunc), globals(), ns)	# models created stored in ns
-        model = ns[functionName]	#get function object by name/string
-        modelMeta = {'model':model,'name':functionName,'form':mixFunc,'paras_symbol':mixParas}
+        model, mixFunc, mixParas = _compileFunction(tuple(functions), operator, functionName)
+        modelMeta = {'model':model,'name':functionName,'form':mixFunc,'paras_symbol':mixParas,
+                    'functions':list(functions),'operator':operator}
     return modelMeta
 
-def generateModels(functions=basicModels_nameList, dataLength=0, piecewise=False, operator='+', maxCombination=2):
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _compileFunction(functions, operator, functionName):
+    '''Compile a composite model from its expression tree (`modelExpr`). It's the process-wide model registry keyed by (functions, operator, functionName),
+    so every composite is compiled once only, and composites of the same structure share one evaluator.
+
+    Returns:
+        model, mixFunc, mixParas: the function object, and its expression and parameters
+            Type: tuple
+    '''
+    mixFunc, mixParas = funcParasExpr(functions, operator=operator)
+    model = compileExpr(modelExpr(functions, operator=operator), functionName)
+    model.jac = funcJac(functions, operator=operator)	#picked up by `curve_fit_m`
+    model.p0 = funcGuess(functions, operator=operator)	#picked up by `getInitialGuess`
+    model.linear = funcLinear(functions, operator=operator)	#picked up by `curve_fit_m`
+    return model, mixFunc, mixParas
+
+def warmModels(functions=basicModels_nameList, piecewise=False, operator='+', maxCombination=2):
+    '''Pre-warm the model registry, e.g. at the startup of a service. Arguments are the same as `generateModels`.
+
+    Returns:
+        info: statistics of the model registry
+            Type: functools._CacheInfo
+    '''
+    generateModels(functions=functions, dataLength=np.inf, piecewise=piecewise, operator=operator, maxCombination=maxCombination)
+    return _compileFunction.cache_info()
+
+def clearModels():
+    '''Clear the model registry.'''
+    _compileFunction.cache_clear()
+    _evaluator.cache_clear()
+
+#pairs of basic models equivalent to a single one, by operator. Amplitudes absorb constant factors and signs, so e.g. a*b^x * c*d^x = (a*c)*(b*d)^x.
+_EQUIVALENT_PAIRS = {
+    '+': {('logarithm', 'logarithm'): 'logarithm'},  #a*log(x)/log(b) + c*log(x)/log(d)
+    '*': {('exponential', 'exponential'): 'exponential', ('power_law', 'power_law'): 'power_law',
+          ('gaussian', 'gaussian'): 'gaussian', ('exponential', 'gaussian'): 'gaussian'},
+    '/': {('exponential', 'exponential'): 'exponential', ('power_law', 'power_law'): 'power_law',
+          ('gaussian', 'exponential'): 'gaussian'},     #(numerator, denominator)
+}
+
+def canonicalFunctions(functions, operator='+'):
+    '''Reduce a composite model to the fewest basic models which are equivalent to it, by the rules of `_EQUIVALENT_PAIRS`, and that a constant
+    factor (or divisor) is absorbed by the amplitude of the other basic models. Polynomials absorb each other as well, e.g. `quadratic + linear` is `quadratic`.
+    Models of '+', '-' and '*' are commutative, so their basic models are sorted. Other operators are returned as they are.
+
+    Parameters:
+        functions: basic models(name of models) to concatenate/mix.
+            Type: list of string
+        operator: arithmetic operation between basic models.
+            Type: string
+            Default: '+'
+    Returns:
+        functions: the reduced basic models
+            Type: tuple
+    '''
+    if operator in ('+', '-'):
+        #a - b is a + (-b), where the amplitude of b absorbs the sign
+        functions = _reducePairs(sorted(functions), _EQUIVALENT_PAIRS['+'])
+        polynomials = [f for f in functions if f in basicModels_nameList[:4]]
+        if len(polynomials) > 1:
+            functions = sorted([f for f in functions if f not in polynomials] + [max(polynomials, key=basicModels_nameList.index)])
+        return tuple(functions)
+    if operator == '*':
+        functions = _reducePairs(sorted(functions), _EQUIVALENT_PAIRS['*'])
+        if len(functions) > 1 and 'constant' in functions: functions.remove('constant')
+        return tuple(functions)
+    if operator == '/':
+        numerator, denominators = functions[0], [f for f in canonicalFunctions(functions[1:], '*') if f != 'constant']
+        for denominator in list(denominators):
+            if (numerator, denominator) in _EQUIVALENT_PAIRS['/']:
+                numerator = _EQUIVALENT_PAIRS['/'][(numerator, denominator)]
+                denominators.remove(denominator)
+        return (numerator, *denominators)
+    return tuple(functions)
+
+def _reducePairs(functions, pairs):
+    '''Replace pairs of sorted basic models by their equivalent one until no rule applies.'''
+    reduced = True
+    while reduced:
+        reduced = False
+        for i in range(len(functions)):
+            for j in range(i+1, len(functions)):
+                if (functions[i], functions[j]) in pairs:
+                    equivalent = pairs[(functions[i], functions[j])]
+                    functions = sorted(functions[:i] + functions[i+1:j] + functions[j+1:] + [equivalent])
+                    reduced = True
+                    break
+            if reduced: break
+    return functions
+
+def _complexity(functions, operator):
+    '''Sort key of models by complexity: the number of basic models, and then the number of parameters.'''
+    n_para = sum(basicModels_dict[f]['n_para'] for f in functions)
+    if 'PIECEWISE' in operator.upper():
+        n_para += len(functions) - (all(f == 'constant' for f in functions))
+    return (len(functions), n_para)
+
+def iterModels(functions=basicModels_nameList, dataLength=0, piecewise=False, operator='+', maxCombination=2, prune=True):
+    '''Yield potential models one by one, ordered by complexity (see `_complexity`). The combinations are enumerated as names first, and a model is built
+    (or fetched from the model registry) only when it's yielded. Arguments are the same as `generateModels`.
+    '''
+    functions0 = sorted(set(functions) & set(basicModels_nameList))	#remove `function` which wasn't in `models`
+    if len(functions0) < 2:
+        print('Warning -- please use "scipy.optimize.curve_fit" directly if only model to fit;'
+            'or check your "functions" is included in\n%s' %basicModels_nameList)
+    if maxCombination >=5:
+        print('Warning -- Key word "maxCombination >= 5" is too big.')
+    if dataLength <=20: piecewise=False
+
+    polynomials = set(functions0) - set(basicModels_nonp_nameList)
+    maxCombination = min(maxCombination, 4)
+    for k in range(1, max(maxCombination, 2 if piecewise else 0) + 1):
+        specs = []
+        if k == 1:
+            #basic models only if `maxCombination` asks for them, as `k` reaches 2 for piecewise models whatever it is
+            specs = [((f,), operator) for f in functions0] if k <= maxCombination else []
+        else:
+            #piecewise function model based on basic models, whatever `maxCombination` is
+            if k == 2 and piecewise:
+                specs = [((f0, f1), 'piecewise') for f0 in functions0 for f1 in functions0]
+            #comprehensive model via arithmetic operations on basic models, with one polynomial at most - addition (substraction), multiplication, and division
+            for funcs in (combinations_with_replacement(functions0, k) if k <= maxCombination else ()):
+                if sum(f in polynomials for f in funcs) > 1: continue
+                if prune and len(canonicalFunctions(funcs, operator)) < k: continue
+                specs.append((funcs, operator))
+        specs.sort(key=lambda spec: _complexity(*spec))
+        for funcs, op in specs:
+            yield generateFunction(list(funcs), operator=op)
+
+def generateModels(functions=basicModels_nameList, dataLength=0, piecewise=False, operator='+', maxCombination=2, prune=True):
     '''Generate potential models.
 
     Parameters:
@@ -165,75 +597,692 @@ def generateModels(functions=basicModels_nameList, dataLength=0, piecewise=False
         maxCombination: max number of combination of basic models.
             Type: integer
             Default: 2
+        prune: if True, skip composites equivalent to one of fewer basic models (see `canonicalFunctions`), e.g. `logarithm + logarithm` or `constant * gaussian`.
+            Type: bool
+            Default: True
     Returns:
-        potential_models: the generated models, include keys: 'model'(function object),'name','form', and 'paras_symbol'
+        potential_models: the generated models ordered by complexity, include keys: 'model'(function object),'name','form', and 'paras_symbol'. See `iterModels` to generate them lazily.
             Type: list of dictionaries
     '''
-    functions0 = list(set(functions) & set(basicModels_nameList))	#remove `function` which wasn't in `models`
-    if len(functions0) < 2:
-        print('Warning -- please use "scipy.optimize.curve_fit" directly if only model to fit;'
-            'or check your "functions" is included in\n%s' %basicModels_nameList)
+    return list(iterModels(functions=functions, dataLength=dataLength, piecewise=piecewise, operator=operator, maxCombination=maxCombination, prune=prune))
 
-    potential_models = []
-    #basic model
-    if maxCombination >= 1:
-        for functionName in functions0:
-            #query the model information
-            current_model = generateFunction(functionName)
-            potential_models.append(current_model)
+def _splitNames(names):
+    '''Split a string of basic models' names joined by "_", e.g. "power_law_gaussian" to ['power_law', 'gaussian']. Return None if it fails.'''
+    for name in sorted(basicModels_nameList, key=len, reverse=True):
+        if names == name:
+            return [name]
+        if names.startswith(name + '_'):
+            rest = _splitNames(names[len(name)+1:])
+            if rest: return [name] + rest
+    return None
 
-    #piecewise function model based on basic models
-    if dataLength <=20: piecewise=False
-    if piecewise:
-        combinations_p =[[f0,f1] for f0 in functions0 for f1 in functions0]
-        for funcs in combinations_p:
-            #generate model
-            current_model = generateFunction(funcs, operator='piecewise')
-            potential_models.append(current_model)
-
-    #comprehensive model via arithmetic operations on basic models - addition (substraction), multiplication, and division
-    functions1 = list(set(functions) & set(basicModels_nonp_nameList))	#filter non-polynomial
-    if len(functions1) > 0:
-        funcs_pair = []
-        if maxCombination >= 2:
-            combinations_2c ={tuple(sorted([f0,f1])) for f0 in functions0 for f1 in functions1}	#unique combinations
-            funcs_pair_2c = [list(t) for t in combinations_2c]
-            funcs_pair = funcs_pair + funcs_pair_2c
-        if maxCombination >= 3:
-            combinations_3c ={tuple(sorted([f0,f1,f2])) for f0 in functions0 for f1 in functions1 for f2 in functions1}
-            funcs_pair_3c = [list(t) for t in combinations_3c]
-            funcs_pair = funcs_pair + funcs_pair_3c
-        if maxCombination >= 4:
-            combinations_4c ={tuple(sorted([f0,f1,f2,f3])) for f0 in functions0 for f1 in functions1 for f2 in functions1 for f3 in functions1}
-            funcs_pair_4c = [list(t) for t in combinations_4c]
-            funcs_pair = funcs_pair + funcs_pair_4c
-        if maxCombination >=5:
-            print('Warning -- Key word "maxCombination >= 5" is too big.')
-            pass
-            
-        for funcs in funcs_pair:
-            #generate model
-            current_model = generateFunction(funcs, operator=operator)
-            potential_models.append(current_model)
-    return potential_models
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def parseModelName(modelname):
+    '''Parse a model name generated by `generateFunction` back into its specification.
 
-def queryModel(modelname):
+    Parameters:
+        modelname: name of model, e.g. 'gaussian', 'operation_power_law_power_law' or 'piecewise_gaussian_linear'
+            Type: string
+    Returns:
+        functions, operator: the basic models and the operation between them. Note that 'operation_' models don't record their arithmetic operator, '+' is returned.
+            Type: tuple
+    '''
+    if modelname in basicModels_nameList:
+        return (modelname,), '+'
+    for prefix, operator in (('operation_', '+'), ('piecewise_', 'piecewise')):
+        if modelname.startswith(prefix):
+            functions = _splitNames(modelname[len(prefix):])
+            if functions and len(functions) >= 2:
+                return tuple(functions), operator
+    raise ValueError('Error -- "%s" is not a name of in-house models' % modelname)
+
+def queryModel(modelname, operator='+'):
     '''Query a in-house model by its modelname. This function is part of the implementation of the reuse fitted models.
 
+    The name is parsed into its specification and only that model is built (or fetched from the model registry), so basic, piecewise and multi-combination models are all supported.
+
     Parameters:
         modelname: the model to query
             Type: string
+        operator: operatation between basic models of an 'operation_' model, which is not recorded by its name.
+            Type: string
+            Default: '+'
     Returns:
         model:
             Type: function object
     '''
-    #get in-house model collection
-    modelCollection = generateModels()
-    #filter specific model
-    model = next(m['model'] for m in modelCollection if m['name'] == modelname)
-    return model
+    functions, operator0 = parseModelName(modelname)
+    if operator0 != 'piecewise': operator0 = operator
+    return generateFunction(list(functions), operator=operator0)['model']
+
+def modelSpec(modelMeta):
+    '''Strip a model to its picklable specification, which is enough to rebuild it by `generateFunction`.
+
+    Parameters:
+        modelMeta: the model generated by `generateFunction`
+            Type: dictionary
+    Returns:
+        spec: include keys 'name', 'functions', 'operator', and 'p0' if the model carries its initial parameters
+            Type: dictionary
+    '''
+    spec = {'name':modelMeta['name'],'functions':modelMeta['functions'],'operator':modelMeta['operator']}
+    if modelMeta.get('p0') is not None: spec['p0'] = modelMeta['p0']
+    return spec
+
+def _fitModel(m, xdata, ydata, kwargs):
+    '''Fit a single candidate model. It's the unit of work of `oneClickCurveFitting`, so it must stay at module level to be picklable.
+
+    Parameters:
+        m: the model generated by `generateFunction`, or its specification by `modelSpec` which will be rebuilt here. Its key 'p0', if any, overrides `p0` of `kwargs`.
+            Type: dictionary
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        kwargs: keyword arguments passed to `curve_fit_m`, `guess` if initialize parameters by `getInitialGuess` when `p0` is not given,
+            `deadline`, the end of the run budget as `time.time()`, which caps `timeout` of `curve_fit_m`, and `starts` to fit by `multiStart` if it's more than 1.
+            `jac_sparsity='auto'` is replaced by `piecewiseSparsity` of the model, and `method='lm'` by 'trf' if the model is bounded or `loss` is robust
+            Type: dict
+    Returns:
+        report_current: a row of report, with the scores 'aic', 'bic' and 'r2_adj' by `scoreFit`, and the instrumentation 'time' (wall time in seconds), 'nfev', 'njev', 'status' and 'message'.
+            'status' is 'converged', 'max_nfev' (the evaluation budget is exhausted, with `strict=False`), 'timeout' (`timeout` or the run budget is exceeded)
+            or 'failed', for the last two 'message' is the reason and 'cost' is inf.
+            Type: dictionary
+    '''
+    start = time.perf_counter()
+    row = {'modelname':m['name'],'form':m.get('form'),'paras_symbol':m.get('paras_symbol'),'parameters':[],'stdevs':[],'cost':np.inf,
+           'aic':np.inf,'bic':np.inf,'r2_adj':np.nan,'time':0.0,'nfev':0,'njev':0,'status':'failed','message':''}
+    try:
+        if 'model' not in m:
+            m = dict(generateFunction(m['functions'], functionName=m['name'], operator=m['operator']), p0=m.get('p0'))
+            row.update(form=m['form'], paras_symbol=m['paras_symbol'])
+        kwargs = dict(kwargs)
+        starts = kwargs.pop('starts', 1)
+        if starts > 1:
+            return multiStart(m, xdata, ydata, starts=starts, **kwargs)
+        if isinstance(getattr(m['model'], 'expr', None), Piecewise):
+            xdata, ydata, kwargs = _sortData(xdata, ydata, kwargs)
+        kwargs = dict(kwargs, bounds = getBounds(m['model'], xdata, ydata), full_output=True)
+        if isinstance(kwargs.get('jac_sparsity'), str) and kwargs['jac_sparsity'] == 'auto':
+            kwargs['jac_sparsity'] = piecewiseSparsity(m['model'], xdata, kwargs['bounds'])
+        if kwargs.get('method') == 'lm' and (np.isfinite(np.concatenate([np.ravel(b) for b in kwargs['bounds']])).any()
+                                             or kwargs.get('loss', 'linear') != 'linear' or kwargs.get('jac_sparsity') is not None):
+            kwargs['method'] = 'trf'     #'lm' can't handle them, e.g. bounds of breakpoints of piecewise models
+        deadline = kwargs.pop('deadline', None)
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise FitTimeout('Run budget is exhausted before the fit starts.')
+            kwargs['timeout'] = remaining if kwargs.get('timeout') is None else min(kwargs['timeout'], remaining)
+        if m.get('p0') is not None: kwargs['p0'] = m['p0']
+        if kwargs.pop('guess', True) and kwargs.get('p0') is None:
+            kwargs['p0'] = getInitialGuess(m['model'], xdata, ydata, kwargs['bounds'])
+        popt, pcov, cost, infodict, errmsg, ier = curve_fit_m(m['model'], xdata, ydata, **kwargs)
+        stdevs = np.sqrt(np.diag(pcov))
+        row.update(parameters=popt.tolist(), stdevs=stdevs.tolist(), cost=cost, nfev=int(infodict['nfev']), njev=int(infodict['njev']),
+                   status='max_nfev' if infodict['status'] == 0 else 'converged', message=errmsg)
+        row.update(scoreFit(cost, popt.size, ydata, kwargs.get('sigma'), kwargs.get('weights')))
+    except FitTimeout as e:
+        row.update(status='timeout', message=str(e), nfev=e.nfev, njev=e.njev)
+    except Exception as e:
+        row['message'] = '%s: %s' % (type(e).__name__, e)
+    row['time'] = time.perf_counter() - start
+    return row
+
+def startPoints(p0, bounds, n, sampler='sobol', spread=1.0, seed=0):
+    '''Starting points of a multi-start fit, by a quasi-random sampler over a box. A parameter spans its bounds if both are finite,
+    otherwise `p0` +/- `spread` * max(|p0|, 1) within its bounds.
+
+    Parameters:
+        p0: the center of the box, e.g. by `getInitialGuess`
+            Type: array_like
+        bounds: lower and upper bounds on parameters, e.g. by `getBounds`
+            Type: 2-tuple of array_like
+        n: the number of points
+            Type: integer
+        sampler: 'sobol' (scrambled Sobol' sequence), 'lhs' (Latin hypercube) or 'random'
+            Type: string
+            Default: 'sobol'
+        spread: relative half width of the box of unbounded parameters
+            Type: float
+            Default: 1.0
+        seed: seed of random numbers
+            Type: integer
+            Default: 0
+    Returns:
+        points: the points in shape of (n, n_para)
+            Type: numpy.ndarray
+    '''
+    from scipy.stats import qmc
+    p0 = np.asarray(p0, dtype=float)
+    lb, ub = prepare_bounds(bounds, p0.size)
+    half = spread * np.maximum(np.absolute(p0), 1)
+    finite = np.isfinite(lb) & np.isfinite(ub)
+    lower = np.where(finite, lb, np.maximum(p0 - half, lb))
+    upper = np.where(finite, ub, np.minimum(p0 + half, ub))
+    if sampler == 'sobol':
+        unit = qmc.Sobol(p0.size, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(max(n, 1)))))[:n]
+    elif sampler == 'lhs':
+        unit = qmc.LatinHypercube(p0.size, seed=seed).random(n)
+    elif sampler == 'random':
+        unit = np.random.default_rng(seed).random((n, p0.size))
+    else:
+        raise ValueError('Error -- "sampler" must be "sobol", "lhs" or "random"')
+    return lower + unit * (upper - lower)
+
+def multiStart(m, xdata, ydata, starts=16, sampler='sobol', spread=1.0, agree=3, rtol=1e-6, seed=0, n_jobs=1, executor=None, **kwargs):
+    '''Fit a model from many starting points, to escape from local minima. The first start is the model's `p0` or the data-driven guess, and the others are by `startPoints`.
+    Starts run in batches of the number of workers, and it stops early once `agree` starts agree on the best cost.
+
+    Parameters:
+        m: the model generated by `generateFunction`
+            Type: dictionary
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        starts: the max number of starts
+            Type: integer
+            Default: 16
+        sampler, spread, seed: the same as `startPoints`
+        agree: stop once so many starts reach the best cost
+            Type: integer
+            Default: 3
+        rtol: relative tolerance of costs to agree
+            Type: float
+            Default: 1e-6
+        n_jobs, executor: the same as `fitModels`
+        kwargs: keyword arguments passed to `curve_fit_m`, and `guess` (default True) if the first start is by `getInitialGuess`.
+            `timeout` applies to each start, not to all of them, while `deadline` (see `_fitModel`) caps all starts.
+            Type: dict
+    Returns:
+        report_current: the row of report of the best start, see `_fitModel`. 'time' is the wall time, 'nfev' and 'njev' are of all starts,
+            and diagnostics 'starts' (the number of starts run), 'agreed' (the number of starts reaching the best cost) and 'costs' (of all starts) are added.
+            Type: dictionary
+    '''
+    start = time.perf_counter()
+    if 'model' not in m:
+        m = dict(generateFunction(m['functions'], functionName=m['name'], operator=m['operator']), p0=m.get('p0'))
+    guess = kwargs.pop('guess', True)
+    xdata, ydata = np.asarray(xdata), np.asarray(ydata)
+    if isinstance(getattr(m['model'], 'expr', None), Piecewise):
+        xdata, ydata, kwargs = _sortData(xdata, ydata, kwargs)    #once for all starts
+    bounds = getBounds(m['model'], xdata, ydata)
+    p0 = m.get('p0')
+    if p0 is None: p0 = kwargs.pop('p0', None)
+    if p0 is None and guess: p0 = getInitialGuess(m['model'], xdata, ydata, bounds)
+    if p0 is None: p0 = np.ones(funcArgsNr(m['model'])-1)
+    points = [np.asarray(p0, dtype=float)] + list(startPoints(p0, bounds, starts-1, sampler=sampler, spread=spread, seed=seed))
+
+    pool, owned = _getExecutor(n_jobs, executor)
+    spec = modelSpec(m) if isinstance(pool, ProcessPoolExecutor) else m
+    batch = (getattr(pool, '_max_workers', None) or os.cpu_count() or 1) if pool is not None else 1
+    rows, best, agreed = [], None, 0
+    try:
+        for i in range(0, len(points), batch):
+            tasks = [dict(spec, p0=p.tolist()) for p in points[i:i+batch]]
+            if pool is None:
+                rows.extend(_fitModel(task, xdata, ydata, kwargs) for task in tasks)
+            else:
+                rows.extend(pool.map(_fitModel, tasks, repeat(xdata), repeat(ydata), repeat(kwargs)))
+            best = min(rows, key=lambda row: row['cost'])
+            agreed = sum(1 for row in rows if np.isfinite(best['cost']) and row['cost'] <= best['cost'] * (1 + rtol) + 1e-300)
+            if agreed >= agree: break
+    finally:
+        if owned: pool.shutdown()
+    row = dict(best, time=time.perf_counter() - start, nfev=sum(r['nfev'] for r in rows), njev=sum(r['njev'] for r in rows),
+               starts=len(rows), agreed=agreed, costs=[r['cost'] for r in rows])
+    return row
 
-def oneClickCurveFitting(xdata, ydata, functions=basicModels_nameList, piecewise=False, operator='+', maxCombination=2, plot_opt=10, xscale=None, yscale=None, filename_startwith='curvefit', silent=False, feedback=False, **kwargs):
+def _sortData(xdata, ydata, kwargs):
+    '''Sort data by `xdata` once per fit of a piecewise model, so its pieces are evaluated on contiguous slices (see `expressions.segmentIndex`). `sigma` and `weights` in `kwargs` are permuted as well.'''
+    xdata = np.asarray(xdata)
+    if xdata.ndim != 1 or np.all(xdata[1:] >= xdata[:-1]):
+        return xdata, ydata, kwargs
+    order = np.argsort(xdata, kind='stable')
+    sigma = kwargs.get('sigma')
+    if sigma is not None:
+        sigma = np.asarray(sigma)
+        kwargs = dict(kwargs, sigma=sigma[order] if sigma.ndim == 1 else sigma[np.ix_(order, order)])
+    if kwargs.get('weights') is not None:
+        kwargs = dict(kwargs, weights=np.asarray(kwargs['weights'])[order])
+    return xdata[order], np.asarray(ydata)[order], kwargs
+
+#criteria to rank models, as keys of rows of report. Lower is better, except 'r2_adj'.
+CRITERIA = ('cost', 'aic', 'bic', 'r2_adj')
+
+def scoreFit(cost, n_para, ydata, sigma=None, weights=None):
+    '''Score a fit by information criteria, which penalize the number of parameters, assuming independent gaussian errors.
+    AIC = n*ln(cost/n) + 2k, BIC = n*ln(cost/n) + k*ln(n), and adjusted R² = 1 - (cost/(n-k)) / (TSS/(n-1)), where `cost` is the (weighted) sum of squared residuals,
+    n the number of points, k the number of parameters, and TSS the (weighted) total sum of squares. Only differences of AIC or BIC between models fitted on the same data matter.
+
+    Parameters:
+        cost: the sum of squared residuals, weighted by `sigma` if any, as `curve_fit_m` returns
+            Type: float
+        n_para: the number of parameters
+            Type: integer
+        ydata: the data fitted
+            Type: numpy.ndarray
+        sigma: `sigma` of `curve_fit_m`. Adjusted R² is nan for a 2-D `sigma`.
+            Type: numpy.ndarray
+            Default: None
+        weights: `weights` of `curve_fit_m`
+            Type: numpy.ndarray
+            Default: None
+    Returns:
+        scores: include keys 'aic', 'bic' and 'r2_adj'
+            Type: dictionary
+    '''
+    ydata = np.asarray(ydata, dtype=float)
+    n = ydata.size
+    if not np.isfinite(cost) or n == 0:
+        return {'aic':np.inf, 'bic':np.inf, 'r2_adj':np.nan}
+    loglik = n * np.log(max(cost / n, np.finfo(float).tiny))   #-2 log-likelihood up to a constant, a perfect fit is clipped
+    r2_adj = np.nan
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+    elif sigma is not None:
+        weights = 1.0 / np.asarray(sigma, dtype=float)**2
+    if n > n_para and (weights is None or weights.ndim == 1):
+        residual = ydata - np.average(ydata, weights=weights)
+        tss = np.dot(residual * residual, weights) if weights is not None else np.dot(residual, residual)
+        if tss > 0: r2_adj = 1.0 - (cost / (n - n_para)) / (tss / (n - 1))
+    return {'aic':float(loglik + 2 * n_para), 'bic':float(loglik + n_para * np.log(n)), 'r2_adj':float(r2_adj)}
+
+def criterionKey(criterion='cost'):
+    '''Sort key of rows of report by one of `CRITERIA`, the best first. Rows without a valid score are the last.'''
+    if criterion not in CRITERIA:
+        raise ValueError('Error -- "criterion" must be one of %s' % (CRITERIA,))
+    sign = -1.0 if criterion == 'r2_adj' else 1.0
+    def key(row):
+        value = sign * row.get(criterion, np.nan)
+        return value if value == value else np.inf
+    return key
+
+def summarizeReport(report):
+    '''Aggregate the instrumentation of a report, e.g. to find out slow or failing candidates.
+
+    Parameters:
+        report: rows of report by `fitModels` (with `failed=True` to count failures and timeouts)
+            Type: list of dictionaries
+    Returns:
+        stats: include keys 'models', 'converged', 'max_nfev', 'failed', 'timeout', 'time' (total wall time), 'nfev', 'njev', 'failures' (count of each failure reason),
+            'slowest' (names of the 10 slowest models), and 'functions', stats of each basic model over all models including it: 'models', 'failed' (with timeouts), 'time' and 'best_cost'.
+            Type: dictionary
+    '''
+    stats = {'models':len(report), 'converged':0, 'max_nfev':0, 'failed':0, 'timeout':0, 'time':0.0, 'nfev':0, 'njev':0, 'failures':{}, 'functions':{}}
+    for row in report:
+        status = row.get('status', 'converged')
+        stats[status] += 1
+        stats['time'] += row.get('time', 0.0)
+        stats['nfev'] += row.get('nfev', 0)
+        stats['njev'] += row.get('njev', 0)
+        if status == 'failed':
+            stats['failures'][row['message']] = stats['failures'].get(row['message'], 0) + 1
+        try:
+            functions = set(parseModelName(row['modelname'])[0])
+        except ValueError:
+            continue
+        for function in functions:
+            f = stats['functions'].setdefault(function, {'models':0, 'failed':0, 'time':0.0, 'best_cost':np.inf})
+            f['models'] += 1
+            f['failed'] += status not in FITTED_STATUSES
+            f['time'] += row.get('time', 0.0)
+            f['best_cost'] = min(f['best_cost'], row['cost'])
+    stats['slowest'] = [row['modelname'] for row in sorted(report, key=lambda row: -row.get('time', 0.0))[:10]]
+    return stats
+
+def _getExecutor(n_jobs=1, executor=None):
+    '''Resolve the `n_jobs` and `executor` options into an executor.
+
+    Returns:
+        pool: the executor, or None if runs serially
+            Type: concurrent.futures.Executor
+        owned: if the pool is created here and should be shutdown by caller
+            Type: boolean
+    '''
+    if isinstance(executor, Executor):
+        return executor, False
+    n_jobs = resolveJobs(n_jobs)
+    if executor is None:
+        if n_jobs == 1: return None, False
+        executor = 'process'
+    if executor == 'process':
+        return ProcessPoolExecutor(max_workers=n_jobs), True
+    elif executor == 'thread':
+        return ThreadPoolExecutor(max_workers=n_jobs), True
+    else:
+        raise ValueError('Error -- "executor" must be "process", "thread" or an instance of concurrent.futures.Executor')
+
+def fitModels(potential_models, xdata, ydata, n_jobs=1, executor=None, silent=False, callback=None, failed=False, time_budget=None, **kwargs):
+    '''Fit the potential models one by one, or fan them out over a pool of processes/threads.
+
+    Parameters:
+        potential_models: models generated by `generateModels`
+            Type: list of dictionaries
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        n_jobs: the number of workers. If it's -1, use all CPUs.
+            Type: integer
+            Default: 1
+        executor: "process", "thread" or an existing instance of `concurrent.futures.Executor`. If None, use "process" when `n_jobs` is not 1.
+            Type: string or object
+            Default: None
+        silent: minimal output to monitor
+            Type: boolean
+            Default: False
+        callback: a function called with every row of report as soon as it's available, failed or not, in the same order of `potential_models`
+            Type: function object
+            Default: None
+        failed: if True, keep failed and timed-out models in report, with 'status' of 'failed' or 'timeout', the reason as 'message' and 'cost' of inf
+            Type: boolean
+            Default: False
+        time_budget: the total wall time of all models in seconds. Fits are stopped once it's exceeded, and models not started yet are reported as 'timeout' without fitting.
+            Type: float
+            Default: None
+        kwargs: keyword arguments passed to `curve_fit_m`, e.g. `timeout`, the wall time of every model in seconds
+            Type: dict
+    Returns:
+        report: succeeded (and failed) models, in the same order of `potential_models`. See `_fitModel` for the instrumentation of rows.
+            Type: list of dictionaries
+    '''
+    if time_budget is not None:
+        #an absolute time, so it holds across processes
+        kwargs['deadline'] = time.time() + time_budget
+    pool, owned = _getExecutor(n_jobs, executor)
+    if pool is None:
+        results = (_fitModel(m, xdata, ydata, kwargs) for m in potential_models)
+    else:
+        #processes can't share the compiled function objects, so only send their specification
+        tasks = [modelSpec(m) for m in potential_models] if isinstance(pool, ProcessPoolExecutor) else potential_models
+        chunksize = max(1, len(tasks) // (4 * (getattr(pool, '_max_workers', None) or os.cpu_count() or 1)))
+        results = pool.map(_fitModel, tasks, repeat(xdata), repeat(ydata), repeat(kwargs), chunksize=chunksize)
+    report = []
+    try:
+        for r in results:
+            if not silent: print('\t%s%s' % (r['modelname'], '' if r['status'] in FITTED_STATUSES else ' (%s)' % r['status']))
+            if callback is not None: callback(r)
+            if failed or r['status'] in FITTED_STATUSES: report.append(r)
+    finally:
+        if owned: pool.shutdown()
+    return report
+
+def _fitSeries(potential_models, xdata, ydata, kwargs):
+    '''Fit all potential models to one series and return the sorted report. It's the unit of work of `fitMany`.'''
+    xdata, ydata = np.asarray(xdata), np.asarray(ydata)
+    if xdata.size <= 20:	#the same rule of `generateModels`
+        potential_models = [m for m in potential_models if 'PIECEWISE' not in m['operator'].upper()]
+    report = fitModels(potential_models, xdata, ydata, silent=True, **kwargs)
+    report.sort(key=lambda m: m['cost'])
+    return report
+
+def _iterSeries(series):
+    '''Normalize items of `series` to (key, xdata, ydata).'''
+    for i, item in enumerate(series):
+        if len(item) == 3:
+            yield item
+        else:
+            yield (i, *item)
+
+def fitMany(series, functions=basicModels_nameList, piecewise=False, operator='+', maxCombination=2, n_jobs=1, executor=None, output=None, top=None, **kwargs):
+    '''Make curve-fits for a lot of independent series. The potential models are generated once and reused across all series, and results are streamed back as a generator.
+
+    Parameters:
+        series: the data to fit, each item is (xdata, ydata) or (key, xdata, ydata). The index of item is used as key if not given.
+            Type: iterable of tuples
+        functions: specified or all (default) basic models(name of models) to fit.
+            Type: list of string
+            Default: basicModels_nameList
+        piecewise: if consider custom a piecewise function. It's ignored by series which size is less than 20.
+            Type: bool
+            Default: False
+        operator: operatation between basic models.
+            Type: string
+            Default: '+'
+        maxCombination: max number of combination of basic models.
+            Type: integer
+            Default: 2
+        n_jobs: the number of workers to fit series in parallel. If it's -1, use all CPUs.
+            Type: integer
+            Default: 1
+        executor: "process", "thread" or an existing instance of `concurrent.futures.Executor`. If None, use "process" when `n_jobs` is not 1.
+            Type: string or object
+            Default: None
+        output: if given, all reports are consolidated into it with an extra column "series", as they finish. See `openReport` for formats.
+            Type: string, pathlib.Path, file object or ReportWriter
+            Default: None
+        top: only keep the best `top` models of each series.
+            Type: integer
+            Default: None
+        kwargs: keyword arguments passed to `curve_fit_m`, and `guess` (default True) if initialize parameters by `getInitialGuess`.
+            Type: dict
+    Yields:
+        key, report: key of the series, and its report sorted by cost
+            Type: tuple
+    '''
+    potential_models = generateModels(functions=functions, dataLength=np.inf, piecewise=piecewise, operator=operator, maxCombination=maxCombination)
+    if 'method' not in kwargs: kwargs['method'] = 'trf'
+    writer = openReport(output) if output is not None else None
+
+    pool, owned = _getExecutor(n_jobs, executor)
+    if pool is None:
+        results = ((key, _fitSeries(potential_models, xdata, ydata, kwargs)) for key, xdata, ydata in _iterSeries(series))
+    else:
+        results = _mapSeries(pool, potential_models, series, kwargs)
+    try:
+        for key, report in results:
+            if top: report = report[:top]
+            if writer: writer.write([{'series':key, **row} for row in report])
+            yield key, report
+    finally:
+        if owned: pool.shutdown()
+        if writer and writer is not output: writer.close()
+
+def _mapSeries(pool, potential_models, series, kwargs):
+    '''Submit series to `pool` with a bounded number of pending tasks, and yield results in order.'''
+    tasks = [modelSpec(m) for m in potential_models] if isinstance(pool, ProcessPoolExecutor) else potential_models
+    window = 4 * (getattr(pool, '_max_workers', None) or os.cpu_count() or 1)
+    pending = deque()
+    for key, xdata, ydata in _iterSeries(series):
+        pending.append((key, pool.submit(_fitSeries, tasks, xdata, ydata, kwargs)))
+        if len(pending) >= window:
+            key, future = pending.popleft()
+            yield key, future.result()
+    while pending:
+        key, future = pending.popleft()
+        yield key, future.result()
+
+def halvingSearch(potential_models, xdata, ydata, budget=10, rate=2, min_models=10, n_jobs=1, executor=None, silent=False, callback=None, failed=False, time_budget=None, **kwargs):
+    '''Successive-halving search over potential models. All models are fitted on a small evaluation budget, the worst ones are discarded, and the budget of survivors is multiplied by `rate`, until only `min_models` models survive and are fully fitted from where they stopped.
+
+    Parameters:
+        potential_models: models generated by `generateModels`
+            Type: list of dictionaries
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        budget: the max number of function evaluations (`max_nfev`) of the first round
+            Type: integer
+            Default: 10
+        rate: only 1/`rate` of models survive every round, and the budget is multiplied by `rate`
+            Type: integer
+            Default: 2
+        min_models: stop halving when the number of models is not more than it
+            Type: integer
+            Default: 10
+        n_jobs, executor, silent, callback, failed, kwargs: the same as `fitModels`
+        time_budget: the total wall time of all rounds in seconds. See `fitModels`.
+            Type: float
+            Default: None
+    Returns:
+        report: fully fitted survivors, in the same order of `potential_models`. Their 'time', 'nfev' and 'njev' include that of all rounds.
+            A survivor which times out, e.g. once `time_budget` is exhausted, keeps the row of the round before, with its parameters and status 'max_nfev'.
+            With `failed=True`, models which failed or timed out in their first round follow them.
+            Type: list of dictionaries
+    '''
+    if time_budget is not None:
+        kwargs['deadline'] = time.time() + time_budget
+    candidates = [dict(m) for m in potential_models]
+    dropped = []    #failed or timed-out rows of former rounds
+    round_kwargs = {k: v for k, v in kwargs.items() if k not in ('max_nfev', 'maxfev')}
+    spent = {}  #instrumentation of former rounds, by model name
+    last = {}   #fitted rows of the last round, by model name
+    def restore(row):
+        #a model timed out after a former round keeps the parameters it reached there, rather than losing them
+        former = last.get(row['modelname'])
+        if row['status'] == 'timeout' and former is not None:
+            row.update({k: v for k, v in former.items() if k not in ('time', 'nfev', 'njev', 'message')},
+                       message='%s Parameters of the former round are kept.' % row['message'])
+    while len(candidates) > max(min_models, 1):
+        if not silent: print('Status -- %d models with budget of %d evaluations.' % (len(candidates), budget))
+        rows = fitModels(candidates, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=True, callback=restore, failed=True, max_nfev=budget, strict=False, **round_kwargs)
+        dropped.extend(row for row in rows if row['status'] not in FITTED_STATUSES)
+        rows = {row['modelname']: row for row in rows if row['status'] in FITTED_STATUSES and np.isfinite(row['cost'])}
+        for name, row in rows.items():
+            s = spent.setdefault(name, {'time':0.0, 'nfev':0, 'njev':0})
+            for key in s: s[key] += row[key]
+        last = rows
+        survivors = sorted(rows.values(), key=lambda row: row['cost'])[:max(int(np.ceil(len(candidates) / rate)), min_models)]
+        survivors = {row['modelname'] for row in survivors}
+        candidates = [dict(m, p0=rows[m['name']]['parameters']) for m in candidates if m['name'] in survivors]
+        budget = budget * rate
+    def accumulate(row):
+        restore(row)
+        for key, value in spent.get(row['modelname'], {}).items(): row[key] += value
+        if callback is not None: callback(row)
+    report = fitModels(candidates, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=accumulate, failed=failed, **kwargs)
+    if failed:
+        for row in dropped:
+            accumulate(row)
+            report.append(row)
+    return report
+
+def _parents(functions):
+    '''Combinations of basic models with one of `functions` removed, as sorted tuples.'''
+    return {tuple(sorted(functions[:i] + functions[i+1:])) for i in range(len(functions))}
+
+def stepwiseSearch(potential_models, xdata, ydata, criterion='bic', full_level=2, beam=10, min_improvement=0.0, n_jobs=1, executor=None, silent=False, callback=None, failed=False, time_budget=None, **kwargs):
+    '''Forward stepwise search over potential models in increasing complexity. Models of one basic model are fitted first, and levels of more basic models
+    follow. Beyond `full_level`, models of k+1 basic models are fitted only if they extend one of the best `beam` models of k basic models by `criterion`.
+    It stops once the best model of a level doesn't improve `criterion` of the former levels by `min_improvement`, so most composites of 3 or 4 basic models are never fitted.
+    Piecewise models are searched the same way by the number of pieces, apart from the arithmetic composites.
+
+    Parameters:
+        potential_models: models generated by `generateModels`
+            Type: list of dictionaries
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        criterion: one of `CRITERIA`, see `scoreFit`
+            Type: string
+            Default: 'bic'
+        full_level: levels of at most so many basic models are fitted fully, since the best pair often contains basic models which are poor alone
+            Type: integer
+            Default: 2
+        beam: the number of models of a level to extend
+            Type: integer
+            Default: 10
+        min_improvement: the least improvement of `criterion` to go on to the next level
+            Type: float
+            Default: 0.0
+        n_jobs, executor, silent, callback, failed, time_budget, kwargs: the same as `fitModels`
+    Returns:
+        report: fitted models level by level, arithmetic composites followed by piecewise models, in the same order of `potential_models` within a level
+            Type: list of dictionaries
+    '''
+    key = criterionKey(criterion)
+    if time_budget is not None:
+        kwargs['deadline'] = time.time() + time_budget
+    #piecewise models are searched in a pool of their own, so they are neither compared with nor extended into arithmetic composites
+    pools = ([m for m in potential_models if 'PIECEWISE' not in m['operator'].upper()], [m for m in potential_models if 'PIECEWISE' in m['operator'].upper()])
+    report = []
+    for pool in pools:
+        levels = {}
+        for m in pool:
+            levels.setdefault(len(m['functions']), []).append(m)
+        best, frontier = np.inf, None
+        for level in sorted(levels):
+            candidates = levels[level] if level <= full_level or frontier is None else [m for m in levels[level] if _parents(m['functions']) & frontier]
+            if not candidates: break
+            if not silent: print('Status -- %d models of %d basic model(s).' % (len(candidates), level))
+            rows = fitModels(candidates, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=callback, failed=True, **kwargs)
+            report.extend(row for row in rows if failed or row['status'] in FITTED_STATUSES)
+            functions = {m['name']: m['functions'] for m in candidates}
+            fitted = sorted((row for row in rows if row['status'] in FITTED_STATUSES and np.isfinite(key(row))), key=key)
+            if not fitted or (np.isfinite(best) and not key(fitted[0]) < best - min_improvement):
+                break
+            best = key(fitted[0])
+            frontier = {tuple(sorted(functions[row['modelname']])) for row in fitted[:beam]}
+    return report
+
+def _takePoints(a, index):
+    '''Take points of a per-point array, `sigma` (1-D, or 2-D covariance) or `weights`, at `index`.'''
+    if a is None:
+        return None
+    a = np.asarray(a)
+    return a[np.ix_(index, index)] if a.ndim == 2 else a[index]
+
+def reducedSearch(potential_models, xdata, ydata, reduce='bin', size=10000, refine=10, seed=0, n_jobs=1, executor=None, silent=False, callback=None, failed=False, time_budget=None, **kwargs):
+    '''Search over potential models for large data. All models are fitted on a reduced data, a binned summary (`binData`) or a stratified subsample (`subsampleData`),
+    and only the best `refine` models are refined on the full data from where they stopped. So the cost of a candidate doesn't grow with the size of data.
+
+    Parameters:
+        potential_models: models generated by `generateModels`
+            Type: list of dictionaries
+        xdata, ydata: data to fit, which can be memory-mapped
+            Type: numpy.ndarray
+        reduce: 'bin' or 'subsample'
+            Type: string
+            Default: 'bin'
+        size: the number of bins or points of reduced data
+            Type: integer
+            Default: 10000
+        refine: the number of models refined on the full data
+            Type: integer
+            Default: 10
+        seed: seed of the subsample
+            Type: integer
+            Default: 0
+        n_jobs, executor, silent, callback, failed, time_budget, kwargs: the same as `fitModels`. Per-point `sigma` and `weights` are subsampled along with the data,
+            but binned data is weighted by standard errors of bins instead, so they apply to the refinement only. They apply as they are to data not reduced.
+    Returns:
+        report: refined models in the same order of `potential_models`, followed by the other models fitted on the reduced data only.
+            Rows carry 'points', the number of points the model is fitted on, and the 'time', 'nfev' and 'njev' of refined models include that on the reduced data.
+            Type: list of dictionaries
+    '''
+    reduced = {}    #`sigma` and `weights` of the reduced data, if it's reduced
+    if reduce == 'bin':
+        x, y, sigma = binData(xdata, ydata, size)
+        #per-point `sigma` and `weights` don't match bins, so they apply to the refinement only
+        if sigma is not None: reduced = dict(sigma=sigma, weights=None)
+    elif reduce == 'subsample':
+        index = subsampleIndex(xdata, size, seed)
+        if index is None:
+            x, y = xdata, ydata
+        else:
+            x, y = np.asarray(xdata[index]), np.asarray(ydata[index])
+            reduced = {key: _takePoints(kwargs.get(key), index) for key in ('sigma', 'weights')}
+    else:
+        raise ValueError('Error -- "reduce" must be "bin" or "subsample"')
+    if time_budget is not None:
+        kwargs['deadline'] = time.time() + time_budget
+    if not silent: print('Status -- %d models on %d points of %d.' % (len(potential_models), x.size, xdata.size))
+    rows = fitModels(potential_models, x, y, n_jobs=n_jobs, executor=executor, silent=True, failed=True, **dict(kwargs, **reduced))
+    for row in rows: row['points'] = x.size
+    if x.size == xdata.size:
+        fitted = []
+    else:
+        fitted = sorted((row for row in rows if row['status'] in FITTED_STATUSES and np.isfinite(row['cost'])), key=lambda row: row['cost'])[:refine]
+    best = {row['modelname']: row for row in fitted}
+    candidates = [dict(m, p0=best[m['name']]['parameters']) for m in potential_models if m['name'] in best]
+    if any(isinstance(getattr(m['model'], 'expr', None), Piecewise) for m in candidates):
+        xdata, ydata, kwargs = _sortData(xdata, ydata, kwargs)    #once here instead of once per piecewise model, with `sigma` and `weights`
+    def accumulate(row):
+        row['points'] = xdata.size
+        for key in ('time', 'nfev', 'njev'): row[key] += best[row['modelname']][key]
+        if callback is not None: callback(row)
+    report = fitModels(candidates, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=accumulate, failed=failed, **kwargs)
+    for row in rows:
+        if row['modelname'] in best or not (failed or row['status'] in FITTED_STATUSES): continue
+        if callback is not None: callback(row)
+        report.append(row)
+    return report
+
+def oneClickCurveFitting(xdata, ydata, functions=basicModels_nameList, piecewise=False, operator='+', maxCombination=2, plot_opt=10, xscale=None, yscale=None, filename_startwith='curvefit', silent=False, feedback=False, output=None, plot_format='png', n_jobs=1, executor=None, guess=True, search='exhaustive', search_options=None, callback=None, timeout=None, time_budget=None, starts=1, rank='cost', **kwargs):
     '''Make a curve-fit in batch.
 
     Parameters:
@@ -268,66 +1317,119 @@ def oneClickCurveFitting(xdata, ydata, functions=basicModels_nameList, piecewise
         silent: minimal output to monitor
             Type: boolean
             Default: False
-        feedback: if True, return the optimal model(function object), parameters
+        feedback: if True, return the optimal model(function object), parameters. It raises `RuntimeError` if no model is fitted.
             Type: boolean
             Default: False
-        kwargs: keyword arguments passed to `curve_fit_m`. Note that `bounds` and `p0` will take no effect when multi-models
+        output: where to write the report, a path (csv, JSON Lines or Parquet by its suffix), a file object or a writer by `openReport`. If None, a csv-format file in folder "curvefit".
+            The report is written once after the sweep, sorted by `rank`. Pass `callback=writer.write` of another writer to write rows as fits finish as well.
+            Type: string, pathlib.Path, file object or ReportWriter
+            Default: None
+        plot_format: 'png' for a figure per model, 'pdf' for a multi-page pdf file, or 'grid' for an image of all models on a grid.
+            Type: string
+            Default: 'png'
+        n_jobs: the number of workers to fit potential models and render figures in parallel. If it's -1, use all CPUs. Note that a process pool requires the call to be protected by `if __name__ == '__main__':`.
+            Type: integer
+            Default: 1
+        executor: "process", "thread" or an existing instance of `concurrent.futures.Executor`. If None, use "process" when `n_jobs` is not 1.
+            Type: string or object
+            Default: None
+        guess: if True, initialize parameters of each model by data-driven guesses (`getInitialGuess`), otherwise by the default of `curve_fit_m`.
+            Type: boolean
+            Default: True
+        search: strategy to search potential models. 'exhaustive' fits all models to full convergence, 'halving' fits them by `halvingSearch`,
+            'reduced' fits them on reduced data by `reducedSearch`, for large data, and 'stepwise' fits them in increasing complexity by `stepwiseSearch`.
+            Type: string
+            Default: 'exhaustive'
+        search_options: keyword arguments passed to the search strategy, e.g. `budget`, `rate` and `min_models` of `halvingSearch`, `reduce`, `size` and `refine` of `reducedSearch`,
+            or `criterion`, `beam` and `min_improvement` of `stepwiseSearch`
+            Type: dict
+            Default: None
+        callback: a function called with every row of report as soon as the model is fitted or failed. See `fitModels`.
+            Type: function object
+            Default: None
+        timeout: the max wall time of fitting a single model in seconds, or of each start with `starts`. Timed-out models are reported with 'status' of 'timeout'.
+            Type: float
+            Default: None
+        time_budget: the max wall time of fitting all models in seconds. Models not fitted in time are reported with 'status' of 'timeout'.
+            Type: float
+            Default: None
+        starts: if it's more than 1, fit each model from so many starting points by `multiStart`, to escape from local minima. The starts of a model run one after another.
+            Type: integer
+            Default: 1
+        rank: one of `CRITERIA` to rank models in report, figures and feedback. 'cost' favours the largest composites, 'aic', 'bic' and 'r2_adj' penalize parameters (see `scoreFit`).
+            Type: string
+            Default: 'cost'
+        kwargs: keyword arguments passed to `curve_fit_m`, e.g. `method` ('trf', 'dogbox' or 'lm'), per-point `weights` or `sigma`, robust `loss` ('soft_l1', 'huber', ...)
+            and `f_scale`, `x_scale`, and `jac_sparsity='auto'` for finite differences of piecewise models by `piecewiseSparsity`. 'lm' is often faster for small data,
+            and falls back to 'trf' for models it can't handle, e.g. piecewise models with bounded breakpoints. Note that `bounds` and `p0` will take no effect when multi-models
             Type: dict
     Returns:
         None
     '''
-    if isinstance(xdata, (np.ndarray, list)):
-        xdata = np.array(xdata)
-    else:
+    if not isinstance(xdata, (np.ndarray, list)):
         raise TypeError('Error -- "xdata" must be array_like object')
-    if isinstance(ydata, (np.ndarray, list)):
-        ydata = np.array(ydata)
-    else:
+    if not isinstance(ydata, (np.ndarray, list)):
         raise TypeError('Error -- "xdata" must be array_like object')
+    #no copy of float64 arrays, and checked once here instead of once per model
+    xdata, ydata = asData(xdata, ydata)
+    if kwargs.get('check_finite', True): checkFinite(xdata, ydata)
+    kwargs['check_finite'] = False
+
+    key = criterionKey(rank)
 
     #generate potential models
     potential_models = generateModels(functions=functions, dataLength=xdata.size, piecewise=piecewise, operator=operator, maxCombination=maxCombination)
 
     #curve fitting
     print('Status -- %d potential models.\nCurve-fitting starts...' % len(potential_models))
-    report = []
-
     if 'method' not in kwargs: kwargs['method'] = 'trf'		#`trf` or specified `method
-    for m in potential_models:
-        try:
-            if not silent: print('\t%s' % m['name'])
-            kwargs.update(bounds = getBounds(m['model'], xdata, ydata))
-            popt, pcov, cost = curve_fit_m(m['model'], xdata, ydata, **kwargs)
-            stdevs = np.sqrt(np.diag(pcov))
-            report_current = [{'modelname':m['name'],'form':m['form'],'paras_symbol':m['paras_symbol'],'parameters':popt.tolist(),'stdevs':stdevs.tolist(),'cost':cost}]
-            report = report + report_current
-        except:
-            pass
-    print('Status -- %d modes succeeded.' % len(report))
-
-    #sort and output report
-    report.sort(key=lambda m: m['cost'])	#sorting
-    output = pathlib.Path('curvefit/%s_report_%s.csv' % (filename_startwith, str(int(time.time()*1e6))))
-    output.parent.mkdir(parents=True, exist_ok=True)
-    writeLogsDicts2csv(output, report)
+    kwargs.pop('p0', None)
+    kwargs.pop('full_output', None)
+    if starts > 1: kwargs['starts'] = starts
+    if search == 'exhaustive':
+        report = fitModels(potential_models, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=callback, failed=True, time_budget=time_budget, guess=guess, timeout=timeout, **kwargs)
+    elif search == 'halving':
+        report = halvingSearch(potential_models, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=callback, failed=True, time_budget=time_budget, guess=guess, timeout=timeout, **(search_options or {}), **kwargs)
+    elif search == 'reduced':
+        report = reducedSearch(potential_models, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=callback, failed=True, time_budget=time_budget, guess=guess, timeout=timeout, **(search_options or {}), **kwargs)
+    elif search == 'stepwise':
+        report = stepwiseSearch(potential_models, xdata, ydata, n_jobs=n_jobs, executor=executor, silent=silent, callback=callback, failed=True, time_budget=time_budget, guess=guess, timeout=timeout, **(search_options or {}), **kwargs)
+    else:
+        raise ValueError('Error -- "search" must be "exhaustive", "halving", "reduced" or "stepwise"')
+    stats = summarizeReport(report)
+    print('Status -- %d modes succeeded.' % (stats['converged'] + stats['max_nfev']))
+    if not silent:
+        print('Status -- %d failed, %d timed out, %.2fs of fitting, %d evaluations. The slowest: %s.' % (stats['failed'], stats['timeout'], stats['time'], stats['nfev'], ', '.join(stats['slowest'][:3])))
+
+    #sort and output report, models fitted on reduced data only after the others, and failed models at the end
+    report.sort(key=lambda m: (m['status'] not in FITTED_STATUSES, m.get('points', xdata.size) < xdata.size, key(m)))	#sorting
+    if output is None:
+        output = pathlib.Path('curvefit/%s_report_%s.csv' % (filename_startwith, str(int(time.time()*1e6))))
+    writer = openReport(output)
+    writer.write(report)
+    saved = writer.path if writer.path is not None else getattr(writer.file, 'name', None)
+    if writer is not output: writer.close()
+    report = [m for m in report if m['status'] in FITTED_STATUSES]
 
     #plot
     if plot_opt:
         print('Plotting starts...')
         report_plot = report[:plot_opt] if isinstance(plot_opt,int) and plot_opt < len(report) else report	#plot all or partly
-        for m in report_plot:
-            model, paras = next(m_p['model'] for m_p in potential_models if m_p['name'] == m['modelname']), m['parameters']
-            ydata_fit = model(xdata, *paras)
-            if xscale == 'linear': xscale=None
-            if yscale == 'linear': yscale=None
-            #'linear' scale will be used and plot as a default and basic
-            if not silent: print('\t%s' % m['modelname'])
-            curve_fit_plot(xdata, ydata, ydata_fit , m['modelname'], filename_startwith=filename_startwith)
-            if xscale or yscale: curve_fit_plot(xdata, ydata, ydata_fit , m['modelname'], xscale=xscale, yscale=yscale, filename_startwith=filename_startwith)
+        models = {m_p['name']: m_p['model'] for m_p in potential_models}
+        #large data is plotted by a subsample
+        plot_x, plot_y = subsampleData(xdata, ydata, (search_options or {}).get('size', 10000)) if search == 'reduced' else (xdata, ydata)
+        items = [(m['modelname'], models[m['modelname']](plot_x, *m['parameters'])) for m in report_plot]
+        if not silent:
+            for m in report_plot: print('\t%s' % m['modelname'])
+        plotModels(items, plot_x, plot_y, xscale=xscale, yscale=yscale, filename_startwith=filename_startwith, plot_format=plot_format, n_jobs=n_jobs, executor=executor)
             
-    print('Reminder -- models report and figures were saved in folder "curvefit".')
+    if saved is not None: print('Reminder -- models report was saved in "%s".' % saved)
+    if plot_opt and report: print('Reminder -- figures were saved in folder "curvefit".')
+    if not report: print('Reminder -- no model was fitted, see "status" and "message" of models in the report.')
 
     if feedback:
+        if not report:
+            raise RuntimeError('Error -- no model was fitted, e.g. all fits failed or "time_budget" ran out, so there is no optimal model to feed back')
         model, paras = next(m_p['model'] for m_p in potential_models if m_p['name'] == report[0]['modelname']), report[0]['parameters']
         return model, paras
     report.clear()
\ No newline at end of file
@@ -1,28 +1,30 @@
 #Basic models or functions in form of f(x,...)
 
 import numpy as np
-from scipy.stats import norm
-from scipy.stats import cauchy as sci_cauchy
-from scipy.stats import pearson3 as sci_pearson3
 from scipy.special import erf as sci_erf
-from scipy.special import expit, logit
+from scipy.special import expit, logit, xlogy, gammaln
 
 from ._helpers import funcArgsNr
+from .kernels import active as _jit    #Numba kernels of basic models, used if `_jit` is not empty, see `kernels.useNumba`
 
 #polynomial functions: constant, linear, quadratic, cubic
 def constant(x, a):
-    y = np.full(x.size, a)
+    if _jit: return _jit['constant'](x, a)
+    y = np.zeros(np.shape(x)) + a    #broadcasts with array of `a`
     return y
 
 def linear(x, a, b):
+    if _jit: return _jit['linear'](x, a, b)
     y = a * x + b
     return y
 
 def quadratic(x, a, b, c):
+    if _jit: return _jit['quadratic'](x, a, b, c)
     y = a * x**2 + b * x + c
     return y
 
 def cubic(x, a, b, c, d):
+    if _jit: return _jit['cubic'](x, a, b, c, d)
     y = a * x**3 + b * x**2 + c * x + d
     return y
     
@@ -35,6 +37,7 @@ def gaussian(x, a, b, c):
     returns:
         y: dependent variable
     '''
+    if _jit: return _jit['gaussian'](x, a, b, c)
     y = a*np.exp(-np.power(x-b,2)/(2*np.power(c,2)))
     #y = a * c * np.sqrt(2*np.pi) * norm.pdf(x, b, c) #equivalent to above
     return y
@@ -47,9 +50,33 @@ def erf(x, a, b, c):
     returns:
         y: dependent variable
     '''
+    if _jit: return _jit['erf'](x, a, b, c)
     y = a * sci_erf((x-b)/c)
     return y
 
+#probability density functions, the same as `scipy.stats` ones without the overhead of distribution objects (argument checks, broadcasting and masking), which dominated the fits of cauchy and pearson3
+def _standardize(x, loc, scale):
+    '''Standardized `x` and `scale`, where `scale` is nan if it's not positive as `scipy.stats`.'''
+    scale = np.where(np.greater(scale, 0), scale, np.nan)
+    return np.true_divide(np.subtract(x, loc), scale), scale
+
+def _cauchy_pdf(x, loc, scale):
+    u, scale = _standardize(x, loc, scale)
+    return 1 / (np.pi * (1 + u**2) * scale)
+
+def _pearson3_pdf(z, skew):
+    '''Standard pdf, the same as `scipy.stats.pearson3.pdf(z, skew)`, i.e. a gamma distribution shifted by `-alpha/beta`, or the normal one if `skew` is nearly 0.'''
+    if _jit: return _jit['pearson3_pdf'](z, skew)
+    with np.errstate(all='ignore'):
+        beta = np.true_divide(2.0, skew)
+        alpha = beta**2
+        t = beta * (z + alpha/beta)    #beta * (z - zeta), the same as scipy
+        p = np.exp(np.log(np.absolute(beta)) + (xlogy(alpha-1, t) - t - gammaln(alpha)))    #the same order as scipy, which matters where `alpha` is huge
+        p = np.where(t >= 0, p, 0.0)
+        p = np.where(np.absolute(skew) < 0.000016, np.exp(-z**2/2) / np.sqrt(2*np.pi), p)
+    p = np.where(np.isnan(p), 0.0, p)
+    return np.where(np.isnan(z) | ~np.isfinite(skew), np.nan, p)
+
 #Cauchy-Lorentz function
 def cauchy(x, a, b, c):
     '''General Cauchy function, the probability density function (PDF) of Cauchy or Lorentz distribution.
@@ -59,7 +86,8 @@ def cauchy(x, a, b, c):
     returns:
         y: dependent variable
     '''
-    y = a * sci_cauchy.pdf(x, loc=b, scale=c)
+    if _jit: return _jit['cauchy'](x, a, b, c)
+    y = a * _cauchy_pdf(x, b, c)
     return y
 
 #Pearson
@@ -72,7 +100,9 @@ def pearson3(x, a, b, c, d):
     returns:
         y: dependent variable
     '''
-    y = a * sci_pearson3.pdf(x, skew=b, loc=c, scale=d)
+    if _jit: return _jit['pearson3'](x, a, b, c, d)
+    z, d = _standardize(x, c, d)
+    y = a * _pearson3_pdf(z, b) / d
     return y
 
 #exponential
@@ -84,6 +114,7 @@ def exponential(x, a, b):
     returns:
         y: dependent variable
     '''
+    if _jit: return _jit['exponential'](x, a, b)
     #y = a*np.exp(b*x)    #natural exponential function
     y = a * b ** x    #equivalent ?
     return y
@@ -91,7 +122,8 @@ def exponential(x, a, b):
 def logarithm(x, a, b):
     '''General logarithm function, inverse function to exponentiation -- y = a * log_b (x)
     '''
-    if b ==1: b = b + 0.001
+    if _jit: return _jit['logarithm'](x, a, b)
+    b = np.where(b == 1, b + 0.001, b)
     y = a * np.log(x) / np.log(b)
     return y
 
@@ -99,6 +131,7 @@ def logistic(x, a, b, c):
     '''General logistic function, the common S-shaped curve.
     https://en.wikipedia.org/wiki/Logistic_function
     '''
+    if _jit: return _jit['logistic'](x, a, b, c)
     y = a * expit(b*x + c)
     return y
 
@@ -107,6 +140,7 @@ def reciprocal(x, a, b):
     
     Note that `np.reciprocal` doesn't work with integers.
     '''
+    if _jit: return _jit['reciprocal'](x, a, b)
     y = 1 /(a * x + b)
     # y = np.reciprocal(a * x + b)
     return y
@@ -115,41 +149,182 @@ def reciprocal(x, a, b):
 def power_law(x, a, b):
     '''General power-law function
     
-    Note that `np.power` doesn't work with a negative integer power.
+    Note that `np.power` doesn't work with a negative integer power, so `b` is cast to float.
     Parameters:
         x: independent variable
         a, b, c: parameters for function
     returns:
         y: dependent variable
     '''
-    y = a * np.power(x, float(b))
+    if _jit: return _jit['power_law'](x, a, b)
+    y = a * np.power(x, np.asarray(b, dtype=float))
     #y = np.power(a * x + b, float(c))
     #y = a*np.power(x + b,float(c))
     return y
 
-__custom = '''
-def %s(x, %s):
-    return %s
-'''
+#analytic Jacobians of basic models, i.e. derivatives to parameters in shape of (..., x.size, n_para)
+def _columns(x, *columns):
+    return np.stack(np.broadcast_arrays(np.asarray(x, dtype=float), *columns)[1:], axis=-1)
+
+def constant_jac(x, a):
+    return _columns(x, 1.0)
+
+def linear_jac(x, a, b):
+    return _columns(x, x, 1.0)
+
+def quadratic_jac(x, a, b, c):
+    return _columns(x, x**2, x, 1.0)
+
+def cubic_jac(x, a, b, c, d):
+    return _columns(x, x**3, x**2, x, 1.0)
+
+def gaussian_jac(x, a, b, c):
+    e = np.exp(-np.power(x-b,2)/(2*np.power(c,2)))
+    return _columns(x, e, a*e*(x-b)/c**2, a*e*(x-b)**2/c**3)
+
+def erf_jac(x, a, b, c):
+    u = (x-b)/c
+    g = 2 / np.sqrt(np.pi) * np.exp(-u**2)
+    return _columns(x, sci_erf(u), -a*g/c, -a*g*u/c)
+
+def cauchy_jac(x, a, b, c):
+    u = (x-b)/c
+    pdf = _cauchy_pdf(x, b, c)
+    return _columns(x, pdf, a*pdf*2*u/(c*(1+u**2)), a*pdf*(u**2-1)/(c*(1+u**2)))
+
+def pearson3_jac(x, a, b, c, d):
+    '''Derivatives of `a` `c` and `d` are analytic, and that of skew `b` is a forward difference.'''
+    z = (x-c)/d
+    p = _pearson3_pdf(z, b)
+    #derivative of the standard pdf to `z`
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = 2.0 / b
+        alpha = beta**2
+        t = beta * z + alpha
+        dp = np.where(t > 0, p * beta * ((alpha-1)/t - 1), 0.0)
+        dp = np.where(np.absolute(b) < 0.000016, -z * p, dp)    #normal approximation, the same as scipy
+    h = 1e-6 * np.maximum(1, np.absolute(b))
+    db = a * (_pearson3_pdf(z, b+h) - p) / (h*d)
+    return _columns(x, p/d, db, -a*dp/d**2, -a*(p+z*dp)/d**2)
+
+def exponential_jac(x, a, b):
+    return _columns(x, b**x, a*x*b**(x-1))
+
+def logarithm_jac(x, a, b):
+    b = np.where(b == 1, b + 0.001, b)
+    return _columns(x, np.log(x)/np.log(b), -a*np.log(x)/(b*np.log(b)**2))
+
+def logistic_jac(x, a, b, c):
+    s = expit(b*x + c)
+    return _columns(x, s, a*s*(1-s)*x, a*s*(1-s))
+
+def reciprocal_jac(x, a, b):
+    d = -1/(a * x + b)**2
+    return _columns(x, d*x, d)
+
+def power_law_jac(x, a, b):
+    y = np.power(x, np.asarray(b, dtype=float))
+    return _columns(x, y, a*xlogy(y, x))    #limit of y*log(x) is 0 where y is 0
+
+#data-driven initial guesses of parameters for basic models, in form of f(x, y) -> list
+def _peak(x, y):
+    '''Location, height and width of the highest peak, by moments weighted by |y|'''
+    i = np.argmax(np.absolute(y))
+    w = np.absolute(y) / np.sum(np.absolute(y))
+    width = np.sqrt(np.sum(w * (x-x[i])**2)) or np.ptp(x) / 4
+    return x[i], y[i], width
+
+def constant_p0(x, y):
+    return [np.mean(y)]
+
+def linear_p0(x, y):
+    return list(np.polyfit(x, y, 1))
+
+def quadratic_p0(x, y):
+    return list(np.polyfit(x, y, 2))
+
+def cubic_p0(x, y):
+    return list(np.polyfit(x, y, 3))
+
+def gaussian_p0(x, y):
+    b, a, c = _peak(x, y)
+    return [a, b, c]
+
+def erf_p0(x, y):
+    order = np.argsort(x)
+    y0, y1 = y[order[0]], y[order[-1]]
+    b = x[np.argmin(np.absolute(y - (y0+y1)/2))]
+    return [(y1-y0)/2, b, np.ptp(x) / 4]
+
+def cauchy_p0(x, y):
+    b, a, c = _peak(x, y)
+    return [a * np.pi * c, b, c]
+
+def pearson3_p0(x, y):
+    c, a, d = _peak(x, y)
+    return [a * d / _pearson3_pdf(0.0, 0.5), 0.5, c, d]
+
+def exponential_p0(x, y):
+    slope, intercept = np.polyfit(x, np.log(np.absolute(y) + 1e-12), 1)
+    return [np.sign(np.mean(y)) * np.exp(intercept), np.exp(slope)]
+
+def logarithm_p0(x, y):
+    mask = x > 0
+    lnx = np.log(x[mask])
+    return [np.sum(y[mask] * lnx) / np.sum(lnx**2), np.e]
+
+def logistic_p0(x, y):
+    a = y[np.argmax(np.absolute(y))]
+    b, c = np.polyfit(x, logit(np.clip(y / a, 0.01, 0.99)), 1)
+    return [a, b, c]
+
+def power_law_p0(x, y):
+    mask = (x > 0) & (y != 0)
+    b, intercept = np.polyfit(np.log(x[mask]), np.log(np.absolute(y[mask])), 1)
+    return [np.sign(np.mean(y)) * np.exp(intercept), b]
+
+def reciprocal_p0(x, y):
+    mask = y != 0
+    return list(np.polyfit(x[mask], 1 / y[mask], 1))
+
+#guesses as flat as possible around 1 over `x`, for factors of multiplication and division, in form of f(x) -> list.
+#Peaks are wide and centred on the data, and erf is centred beside it. Other models are guessed by `p0` on ones, which is flat already.
+def gaussian_flat(x):
+    return [1.0, (np.min(x)+np.max(x))/2, np.ptp(x) / 2]
+
+def erf_flat(x):
+    return [1.0, np.min(x) - np.ptp(x), np.ptp(x)]
+
+def cauchy_flat(x):
+    return [np.pi * np.ptp(x) / 2, (np.min(x)+np.max(x))/2, np.ptp(x) / 2]
+
+def pearson3_flat(x):
+    return [np.ptp(x) / 2 / _pearson3_pdf(0.0, 0.5), 0.5, (np.min(x)+np.max(x))/2, np.ptp(x) / 2]
+
             
 #metadata of custom basic models/functions
 basicModels = [
-    {'model':constant,'name':'constant','n_para':funcArgsNr(constant)-1},
-    {'model':linear,'name':'linear','n_para':funcArgsNr(linear)-1},
-    {'model':quadratic,'name':'quadratic','n_para':funcArgsNr(quadratic)-1},
-    {'model':cubic,'name':'cubic','n_para':funcArgsNr(cubic)-1},
-    {'model':gaussian,'name':'gaussian','n_para':funcArgsNr(gaussian)-1},
-    {'model':erf,'name':'erf','n_para':funcArgsNr(erf)-1},
-    {'model':cauchy,'name':'cauchy','n_para':funcArgsNr(cauchy)-1},
-    {'model':pearson3,'name':'pearson3','n_para':funcArgsNr(pearson3)-1},
-    {'model':exponential,'name':'exponential','n_para':funcArgsNr(exponential)-1},
-    {'model':logarithm,'name':'logarithm','n_para':funcArgsNr(logarithm)-1},
-    {'model':logistic,'name':'logistic','n_para':funcArgsNr(logistic)-1},
-    {'model':power_law,'name':'power_law','n_para':funcArgsNr(power_law)-1},
-    {'model':reciprocal,'name':'reciprocal','n_para':funcArgsNr(reciprocal)-1},
+    {'model':constant,'name':'constant','n_para':funcArgsNr(constant)-1,'jac':constant_jac,'p0':constant_p0,'linear':(0,)},
+    {'model':linear,'name':'linear','n_para':funcArgsNr(linear)-1,'jac':linear_jac,'p0':linear_p0,'linear':(0, 1)},
+    {'model':quadratic,'name':'quadratic','n_para':funcArgsNr(quadratic)-1,'jac':quadratic_jac,'p0':quadratic_p0,'linear':(0, 1, 2)},
+    {'model':cubic,'name':'cubic','n_para':funcArgsNr(cubic)-1,'jac':cubic_jac,'p0':cubic_p0,'linear':(0, 1, 2, 3)},
+    {'model':gaussian,'name':'gaussian','n_para':funcArgsNr(gaussian)-1,'jac':gaussian_jac,'p0':gaussian_p0,'flat':gaussian_flat,'linear':(0,)},
+    {'model':erf,'name':'erf','n_para':funcArgsNr(erf)-1,'jac':erf_jac,'p0':erf_p0,'flat':erf_flat,'linear':(0,)},
+    {'model':cauchy,'name':'cauchy','n_para':funcArgsNr(cauchy)-1,'jac':cauchy_jac,'p0':cauchy_p0,'flat':cauchy_flat,'linear':(0,)},
+    {'model':pearson3,'name':'pearson3','n_para':funcArgsNr(pearson3)-1,'jac':pearson3_jac,'p0':pearson3_p0,'flat':pearson3_flat,'linear':(0,)},
+    {'model':exponential,'name':'exponential','n_para':funcArgsNr(exponential)-1,'jac':exponential_jac,'p0':exponential_p0,'linear':(0,)},
+    {'model':logarithm,'name':'logarithm','n_para':funcArgsNr(logarithm)-1,'jac':logarithm_jac,'p0':logarithm_p0,'linear':(0,)},
+    {'model':logistic,'name':'logistic','n_para':funcArgsNr(logistic)-1,'jac':logistic_jac,'p0':logistic_p0,'linear':(0,)},
+    {'model':power_law,'name':'power_law','n_para':funcArgsNr(power_law)-1,'jac':power_law_jac,'p0':power_law_p0,'linear':(0,)},
+    {'model':reciprocal,'name':'reciprocal','n_para':funcArgsNr(reciprocal)-1,'jac':reciprocal_jac,'p0':reciprocal_p0,'linear':()},
     ]
 #list of models' name
 basicModels_nameList = [model['name'] for model in basicModels]
 basicModels_nonp_nameList = [model['name'] for model in basicModels[4:]]    #non-polynomial
+basicModels_dict = {model['name']:model for model in basicModels}    #query models by name
+for _m in basicModels:
+    _m['model'].jac = _m['jac']    #picked up by `curve_fit_m`
+    _m['model'].p0 = _m['p0']    #picked up by `getInitialGuess`
+    _m['model'].linear = _m['linear']    #indices of parameters which enter linearly, picked up by `curve_fit_m`
 #models=['constant', 'linear', 'quadratic', 'cubic', 'gaussian', 'erf', 'cauchy', 'exponential', 'logarithm', 'logistic', 'reciprocal', 'power_law', 'pearson3']
 #models=['constant', 'linear', 'quadratic', 'cubic', 'gaussian', 'erf', 'cauchy', 'exponential', 'logarithm', 'logistic', 'power_law', 'pearson3']
@@ -0,0 +1,180 @@
+#Report writers -- append rows of report incrementally to csv, JSON Lines or Parquet files
+
+import pathlib
+import csv
+import json
+
+import numpy as np
+
+from ._helpers import fileIsValid
+
+def _plain(value):
+    '''Convert numpy scalars and arrays to built-in python types.'''
+    if isinstance(value, np.ndarray): return value.tolist()
+    if isinstance(value, np.generic): return value.item()
+    return value
+
+class ReportWriter:
+    '''Base of report writers. A writer keeps its file open, and rows are appended by `write`, e.g. as series of `fitMany` finish,
+    or as fits finish if it's passed as `callback=writer.write`.
+
+    Parameters:
+        target: a path, or a file object which is not closed by the writer
+            Type: string, pathlib.Path or file object
+    '''
+    mode = 'a'
+    newline = ''
+
+    def __init__(self, target):
+        self.owned = not hasattr(target, 'write')
+        if self.owned:
+            self.path = pathlib.Path(target)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.append = fileIsValid(self.path)
+            self.file = open(self.path, self.mode, newline=self.newline)
+        else:
+            self.path, self.append, self.file = None, False, target
+        self.count = 0
+
+    def write(self, rows):
+        '''Append rows of report.
+
+        Parameters:
+            rows: a row or a list of rows of report
+                Type: dictionary, list of dictionaries
+        Returns:
+            None
+        '''
+        if isinstance(rows, dict): rows = [rows]
+        rows = [{k: _plain(v) for k, v in row.items()} for row in rows]
+        if rows:
+            self._write(rows)
+            self.count += len(rows)
+
+    def close(self):
+        if self.owned and self.file is not None:
+            self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CSVReportWriter(ReportWriter):
+    '''Write report to a csv-format file, the same format of `writeLogsDicts2csv`. The header is written once, and only if the file is new or empty.
+    It's all columns of the first rows written, or the header of the file appended to. Columns missing in a row are left empty,
+    while a column not in the header raises `ValueError` instead of being dropped.
+    '''
+    def _write(self, rows):
+        columns = list(dict.fromkeys(k for row in rows for k in row))
+        if not hasattr(self, 'writer'):
+            header = self._header() if self.append else None
+            self.writer = csv.DictWriter(self.file, fieldnames=header or columns)
+            if not self.append: self.writer.writeheader()
+        extra = [k for k in columns if k not in self.writer.fieldnames]
+        if extra:
+            raise ValueError('Error -- columns %s are not in the header of csv report' % extra)
+        self.writer.writerows(rows)
+
+    def _header(self):
+        '''The header of the existing file.'''
+        with open(self.path, newline='') as f:
+            return next(csv.reader(f), None)
+
+def _finite(value):
+    '''Replace non-finite floats by None (null), which strict JSON has no literal for, in lists and dictionaries as well.'''
+    if isinstance(value, float): return value if np.isfinite(value) else None
+    if isinstance(value, (list, tuple)): return [_finite(v) for v in value]
+    if isinstance(value, dict): return {k: _finite(v) for k, v in value.items()}
+    return value
+
+class JSONLReportWriter(ReportWriter):
+    '''Write report to a JSON Lines file, a row per line, with parameters and stdevs as arrays. Non-finite numbers, e.g. 'cost' of failed models, are written as null.'''
+    newline = None
+
+    def _write(self, rows):
+        self.file.write(''.join(json.dumps(_finite(row), allow_nan=False) + '\n' for row in rows))
+
+class ParquetReportWriter(ReportWriter):
+    '''Write report to a Parquet file, with parameters and stdevs as list<double> columns. It requires `pyarrow`.
+    Rows are buffered and written as a row group every `batch_size` rows. The schema is inferred from the first row group, except the columns
+    of report, which are typed explicitly, so a first row group of failed models (e.g. empty parameters) doesn't decide them.
+    Unlike csv and JSON Lines, a Parquet file can't be appended to, so an existing path raises `FileExistsError`.
+    '''
+    mode = 'xb'
+    newline = None
+    #types of columns of report, by `_fitModel` and `multiStart`
+    types = {'modelname':'string', 'form':'string', 'paras_symbol':'string', 'parameters':'list<double>', 'stdevs':'list<double>',
+             'cost':'double', 'aic':'double', 'bic':'double', 'r2_adj':'double', 'time':'double', 'nfev':'int64', 'njev':'int64',
+             'status':'string', 'message':'string', 'points':'int64', 'starts':'int64', 'agreed':'int64', 'costs':'list<double>'}
+
+    def __init__(self, target, batch_size=65536):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Error -- "pyarrow" is required to write Parquet report')
+        if not hasattr(target, 'write') and pathlib.Path(target).exists():
+            raise FileExistsError('Error -- "%s" exists, and a Parquet report can\'t be appended to' % target)
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.batch_size = batch_size
+        self.buffer = []
+        self.writer = None
+        super().__init__(target)
+
+    def _write(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batch_size: self.flush()
+
+    def _schema(self):
+        '''The schema inferred from the buffered rows, with the columns of report typed by `types`.'''
+        types = {'string':self.pa.string(), 'double':self.pa.float64(), 'int64':self.pa.int64(), 'list<double>':self.pa.list_(self.pa.float64())}
+        schema = self.pa.Table.from_pylist(self.buffer).schema
+        for i, field in enumerate(schema):
+            if field.name in self.types:
+                schema = schema.set(i, self.pa.field(field.name, types[self.types[field.name]]))
+        return schema
+
+    def flush(self):
+        if not self.buffer: return
+        table = self.pa.Table.from_pylist(self.buffer, schema=self.writer.schema if self.writer else self._schema())
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.file, table.schema)
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            if self.writer is not None: self.writer.close()
+        super().close()
+
+reportWriters = {'csv':CSVReportWriter, 'jsonl':JSONLReportWriter, 'parquet':ParquetReportWriter}
+
+def openReport(target, format=None, **kwargs):
+    '''Open a report writer.
+
+    Parameters:
+        target: a path, a file object, or an opened writer which is returned as it is
+            Type: string, pathlib.Path, file object or ReportWriter
+        format: one of 'csv', 'jsonl' and 'parquet'. If None, inferred from suffix of path ('.jsonl' or '.ndjson' for JSON Lines, '.parquet' or '.pq'), or 'csv'.
+            A '.json' path raises `ValueError`, since a JSON Lines file is not valid JSON.
+            Type: string
+            Default: None
+        kwargs: keyword arguments passed to the writer
+            Type: dict
+    Returns:
+        writer:
+            Type: ReportWriter
+    '''
+    if isinstance(target, ReportWriter): return target
+    if format is None:
+        suffix = pathlib.Path(target).suffix.lower() if isinstance(target, (str, pathlib.Path)) else ''
+        if suffix == '.json':
+            raise ValueError('Error -- report is written as JSON Lines, name it by ".jsonl" or ".ndjson" instead of ".json"')
+        format = {'.jsonl':'jsonl', '.ndjson':'jsonl', '.parquet':'parquet', '.pq':'parquet'}.get(suffix, 'csv')
+    if format not in reportWriters:
+        raise ValueError('Error -- "format" must be one of %s' % list(reportWriters))
+    return reportWriters[format](target, **kwargs)
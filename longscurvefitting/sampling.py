@@ -0,0 +1,114 @@
+#Reduce large data for fitting -- stratified subsamples and binned summaries, computed chunk by chunk so memory-mapped arrays are never loaded as a whole
+
+import numpy as np
+
+#number of points processed at once
+CHUNK_SIZE = 1 << 20
+
+def _chunks(n, size=CHUNK_SIZE):
+    for start in range(0, n, size):
+        yield slice(start, min(start + size, n))
+
+def asData(xdata, ydata):
+    '''View data as 1-D float64 arrays, without copying float64 arrays, including memory-mapped ones (`numpy.memmap` or `numpy.load(..., mmap_mode='r')`).
+
+    Parameters:
+        xdata, ydata: data to fit
+            Type: array_like
+    Returns:
+        xdata, ydata: the data
+            Type: numpy.ndarray
+    '''
+    xdata, ydata = np.asarray(xdata, dtype=float).reshape(-1), np.asarray(ydata, dtype=float).reshape(-1)
+    if xdata.size != ydata.size:
+        raise ValueError('Error -- "xdata" and "ydata" must be in the same size')
+    return xdata, ydata
+
+def checkFinite(*arrays):
+    '''Raise an error as `numpy.asarray_chkfinite` does if any array contains infs or NaNs, checking chunk by chunk instead of a temporary array in the full size.'''
+    for a in arrays:
+        for s in _chunks(a.size):
+            if not np.isfinite(a[s]).all():
+                raise ValueError('array must not contain infs or NaNs')
+
+def isSorted(x):
+    '''If `x` is in non-decreasing order, checked chunk by chunk.'''
+    for s in _chunks(x.size - 1):
+        if not (x[s.start+1:s.stop+1] >= x[s]).all():
+            return False
+    return True
+
+def subsampleData(xdata, ydata, size=10000, seed=0):
+    '''Draw a subsample stratified by `x`: the data is split into `size` blocks of consecutive ranks of `x`, and a point is drawn at random from every block.
+    So the subsample covers the whole range of `x` as densely as the data. It's argsorted once if `xdata` is not sorted.
+
+    Parameters:
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        size: the number of points
+            Type: integer
+            Default: 10000
+        seed: seed of random numbers
+            Type: integer
+            Default: 0
+    Returns:
+        xdata, ydata: the subsample in order of `x`, or the data itself if it's not larger than `size`
+            Type: numpy.ndarray
+    '''
+    index = subsampleIndex(xdata, size, seed)
+    if index is None:
+        return xdata, ydata
+    return np.asarray(xdata[index]), np.asarray(ydata[index])
+
+def subsampleIndex(xdata, size=10000, seed=0):
+    '''Indices of the subsample drawn by `subsampleData`, to take per-point arrays, e.g. `sigma`, along with the data.
+
+    Parameters:
+        xdata: the independent variable
+            Type: numpy.ndarray
+        size, seed: the same as `subsampleData`
+    Returns:
+        index: indices in order of `x`, or None if the data is not larger than `size`
+            Type: numpy.ndarray
+    '''
+    n = xdata.size
+    if n <= size:
+        return None
+    edges = np.linspace(0, n, size + 1).astype(np.intp)
+    rng = np.random.default_rng(seed)
+    ranks = edges[:-1] + (rng.random(size) * (edges[1:] - edges[:-1])).astype(np.intp)
+    return ranks if isSorted(xdata) else np.argsort(xdata, kind='stable')[ranks]
+
+def binData(xdata, ydata, bins=10000):
+    '''Summarize data by means of `y` in equal-width bins of `x`, with weights as `sigma`. Empty bins are dropped.
+    `sigma` of a bin is the pooled standard deviation of `y` within bins divided by the square root of its count, i.e. the standard error of its mean,
+    so fitting the summary with `sigma` weighs every bin by the number of points in it.
+
+    Parameters:
+        xdata, ydata: data to fit
+            Type: numpy.ndarray
+        bins: the number of bins
+            Type: integer
+            Default: 10000
+    Returns:
+        xdata, ydata, sigma: means of `x` and `y` in bins, and the standard errors, or the data itself and None if it's not larger than `bins`
+            Type: numpy.ndarray
+    '''
+    n = xdata.size
+    if n <= bins:
+        return xdata, ydata, None
+    xmin, xmax, ysum = np.inf, -np.inf, 0.0
+    for s in _chunks(n):
+        xmin, xmax, ysum = min(xmin, xdata[s].min()), max(xmax, xdata[s].max()), ysum + ydata[s].sum()
+    ymean = ysum / n    #`y` is centered against cancellation
+    width = (xmax - xmin) / bins or 1.0
+    sums = np.zeros((4, bins))  #count, sum of x, sum of y, sum of y**2
+    for s in _chunks(n):
+        x, y = xdata[s], ydata[s] - ymean
+        index = np.minimum(((x - xmin) / width).astype(np.intp), bins - 1)
+        for i, weights in enumerate((None, x, y, y*y)):
+            sums[i] += np.bincount(index, weights=weights, minlength=bins)
+    count, sx, sy, syy = sums[:, sums[0] > 0]
+    within = np.sum(syy - sy**2 / count)
+    pooled = np.sqrt(within / (n - count.size)) if within > 0 else 1.0
+    return sx / count, sy / count + ymean, pooled / np.sqrt(count)
@@ -1,18 +1,125 @@
 #curve fitting module -- mini-modified scipy.optimize.curve_fit
 
 import numpy as np
-from scipy.optimize import least_squares
+from scipy.optimize import least_squares, leastsq, OptimizeWarning
 from scipy.optimize._lsq.least_squares import prepare_bounds
-from scipy.optimize._minpack_py import _wrap_func, _initialize_feasible
-from scipy.linalg import svd
+from scipy.optimize._minpack_py import _wrap_func, _wrap_jac, _initialize_feasible
+from scipy.linalg import svd, lstsq, cholesky, LinAlgError
+from scipy.sparse import issparse
+import time
+import warnings
+
+from .kernels import autoNumba
+
+class FitTimeout(RuntimeError):
+    '''Raised by `curve_fit_m` when the fit runs longer than `timeout`. `nfev` and `njev` are the evaluations done until then.'''
+    def __init__(self, message, nfev=0, njev=0):
+        super().__init__(message)
+        self.nfev = nfev
+        self.njev = njev
+
+def _withTimeout(func, jac, timeout):
+    '''Wrap the residual and Jacobian to count evaluations and check the clock on every one of them, so a fit is stopped cooperatively once `timeout` seconds pass.'''
+    deadline = time.perf_counter() + timeout
+    count = {'nfev':0, 'njev':0}
+    def check():
+        if time.perf_counter() > deadline:
+            raise FitTimeout('Timeout of %gs is exceeded after %d evaluations.' % (timeout, count['nfev']), **count)
+    def wrapped_func(p):
+        check()
+        count['nfev'] += 1
+        return func(p)
+    if not callable(jac):
+        return wrapped_func, jac
+    def wrapped_jac(p):
+        check()
+        count['njev'] += 1
+        return jac(p)
+    return wrapped_func, wrapped_jac
+
+def _pinv_cov(J):
+    '''Do Moore-Penrose inverse of J^T J discarding zero singular values.'''
+    if issparse(J):
+        J = J.toarray()     #by finite differences with `jac_sparsity`
+    _, s, VT = svd(J, full_matrices=False)
+    threshold = np.finfo(float).eps * max(J.shape) * s[0]
+    s = s[s > threshold]
+    VT = VT[:s.size]
+    return np.dot(VT.T / s**2, VT)
+
+def _varpro(func, jac, p0, is_linear, lb, ub, max_nfev=None):
+    '''Variable projection -- optimize the nonlinear parameters only, with the linear ones solved by
+    linear least squares for every evaluation. The Jacobian is Kaufman's approximation.
+
+    Parameters:
+        func, jac: the wrapped residual and Jacobian of all parameters
+        p0: initial parameters
+        is_linear: mask of linear parameters
+        lb, ub: bounds, which must be infinite for linear parameters
+    Returns:
+        p: parameters to start the full problem, or `p0` if it fails
+        nfev, njev: number of evaluations of residuals and Jacobians
+    '''
+    cache = {}
+    def project(theta):
+        key = theta.tobytes()
+        if key not in cache:
+            cache.clear()
+            p = np.zeros(p0.size)
+            p[~is_linear] = theta
+            r0 = func(p)    #residual without linear terms
+            A = jac(p)[:, is_linear]
+            p[is_linear] = lstsq(A, -r0)[0]
+            cache[key] = (p, r0 + A.dot(p[is_linear]), A)
+        return cache[key]
+    def residual(theta):
+        return project(theta)[1]
+    def jacobian(theta):
+        p, _, A = project(theta)
+        J = jac(p)[:, ~is_linear]
+        return J - A.dot(lstsq(A, J)[0])
+    try:
+        res = least_squares(residual, p0[~is_linear], jac=jacobian, bounds=(lb[~is_linear], ub[~is_linear]), max_nfev=max_nfev)
+        p = project(res.x)[0]
+        return (p if np.all(np.isfinite(p)) else p0), res.nfev, res.njev
+    except FitTimeout:
+        raise
+    except Exception:
+        return p0, 0, 0
 
 def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
               check_finite=True, bounds=(-np.inf, np.inf), method=None,
-              jac=None, **kwargs):
+              jac=None, strict=True, linear_solve=True, timeout=None, weights=None, **kwargs):
     """
     Instruction and source of `scipy.optimize.curve_fit` can be found in 
     https://github.com/scipy/scipy/blob/adc4f4f7bab120ccfab9383aba272954a0a12fb0/scipy/optimize/minpack.py#L511-L813
+
+    If `jac` is None and the model `f` carries an analytic Jacobian as attribute `f.jac` (all in-house models do),
+    it's used instead of finite differences. Pass `jac='2-point'` to force finite differences.
+
+    If `strict` is False, the current estimate is returned instead of raising an error when
+    the evaluation budget `max_nfev` is exhausted, which is used by a budgeted search.
+
+    If `linear_solve` is True and the model `f` carries attribute `f.linear`, indices of parameters which
+    enter linearly (all in-house models do), a model linear in all parameters is solved in closed form, and
+    the linear parameters of other models are eliminated by variable projection before the final polish.
+    Variable projection and the polish share one evaluation budget `max_nfev`.
+
+    If `timeout` is given, the fit is stopped by `FitTimeout` once it runs longer than `timeout` seconds. It's checked on
+    every evaluation of the residual and Jacobian, so a single evaluation is never interrupted.
+
+    `weights` are per-point weights of squared residuals, i.e. `sigma = 1/sqrt(weights)` without dividing by zero weights. Only one of `sigma` and `weights` can be given.
+
+    `loss` and `f_scale` (robust losses, e.g. 'soft_l1' and 'huber'), `x_scale` and `jac_sparsity` are passed to `scipy.optimize.least_squares`.
+    `jac_sparsity` applies to Jacobians by finite differences only, so it makes them used instead of the analytic `f.jac` unless `jac` is given.
+    The reported `cost` is the (weighted) sum of squared residuals under any loss. Method 'lm' runs `scipy.optimize.leastsq`, with `max_nfev`
+    as its `maxfev` and `x_scale` as its `diag`, and doesn't support robust losses or `jac_sparsity`.
+
+    If `full_output` is True, `infodict`, `errmsg` and `ier` are returned as well for all methods, not only 'lm'.
+    `infodict` includes 'nfev', 'njev' (both with the evaluations of variable projection), 'fvec' and 'status'
+    ('status' of `scipy.optimize.least_squares`, or `ier` of 'lm'), and `errmsg` is the termination message.
     """
+    autoNumba()    #Numba kernels of basic models, if installed
     if p0 is None:
         # determine number of parameters by inspecting the function
         from ._helpers import funcArgsNr
@@ -29,7 +136,7 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
     
     bounded_problem = np.any((lb > -np.inf) | (ub < np.inf))
     if method is None:
-        if bounded_problem:
+        if bounded_problem or kwargs.get('loss', 'linear') != 'linear' or kwargs.get('jac_sparsity') is not None:
                 method = 'trf'
         else:
                 method = 'lm'
@@ -37,6 +144,9 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
     if method == 'lm' and bounded_problem:
         raise ValueError("Method 'lm' only works for unconstrained problems. "
                                             "Use 'trf' or 'dogbox' instead.")
+    if method == 'lm' and (kwargs.get('loss', 'linear') != 'linear' or kwargs.get('jac_sparsity') is not None):
+        raise ValueError("Method 'lm' supports neither robust `loss` nor `jac_sparsity`. "
+                                            "Use 'trf' or 'dogbox' instead.")
 
     # optimization may produce garbage for float32 inputs, cast them to float64
 
@@ -57,8 +167,17 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
     if ydata.size == 0:
         raise ValueError("`ydata` must not be empty!")
 
+    if weights is not None:
+        if sigma is not None:
+            raise ValueError("Only one of `sigma` and `weights` can be given.")
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (ydata.size, ):
+            raise ValueError("`weights` has incorrect shape.")
+        if np.any(weights < 0):
+            raise ValueError("`weights` must be non-negative.")
+        transform = np.sqrt(weights)
     # Determine type of sigma
-    if sigma is not None:
+    elif sigma is not None:
         sigma = np.asarray(sigma)
 
         # if 1-d, sigma are errors, define transform = 1/sigma
@@ -78,6 +197,8 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
             transform = None
 
     func = _wrap_func(f, xdata, ydata, transform)
+    if jac is None and kwargs.get('jac_sparsity') is None:
+        jac = getattr(f, 'jac', None)
     if callable(jac):
         jac = _wrap_jac(jac, xdata, transform)
     elif jac is None and method != 'lm':
@@ -89,16 +210,59 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
         # acceptable call signatures of `f`.
         raise ValueError("'args' is not a supported keyword argument.")
 
+    if timeout is not None:
+        func, jac = _withTimeout(func, jac, timeout)
+
+    # Remove full_output from kwargs, otherwise we're passing it in twice.
+    return_full = kwargs.pop('full_output', False)
+    varpro_nfev = varpro_njev = 0
+
+    linear = getattr(f, 'linear', None) if linear_solve else None
+    if linear and callable(jac) and kwargs.get('loss', 'linear') == 'linear':
+        is_linear = np.zeros(n, dtype=bool)
+        is_linear[list(linear)] = True
+        if np.all(np.isinf(lb[is_linear]) & np.isinf(ub[is_linear])):
+            if is_linear.all():
+                method = 'lstsq'
+            else:
+                budget_key = 'max_nfev' if kwargs.get('max_nfev') is not None else 'maxfev'
+                budget = kwargs.get(budget_key)
+                p0, varpro_nfev, varpro_njev = _varpro(func, jac, p0, is_linear, lb, ub, budget)
+                if budget is not None:
+                    # the refinement spends what is left of the budget, at least the evaluation of its start
+                    kwargs[budget_key] = max(budget - varpro_nfev, 1)
+
     #print(method)
-    if method == 'lm':
-        # Remove full_output from kwargs, otherwise we're passing it in twice.
-        return_full = kwargs.pop('full_output', False)
-        res = leastsq(func, p0, Dfun=jac, full_output=1, **kwargs)
+    if method == 'lstsq':
+        # linear in all parameters, func(p) = A p - b
+        A = jac(p0)
+        b = -func(np.zeros(n))
+        popt = lstsq(A, b)[0]
+        fvec = A.dot(popt) - b
+        ysize = len(fvec)
+        cost = np.sum(fvec ** 2)
+        pcov = _pinv_cov(A)
+        infodict = {'nfev':1, 'njev':1, 'fvec':fvec, 'status':1}
+        errmsg, ier = 'Solved in closed form by linear least squares.', 1
+    elif method == 'lm':
+        # Rename max_nfev (least_squares) to maxfev (leastsq), and x_scale to diag, if specified.
+        max_nfev = kwargs.pop('max_nfev', None)
+        if max_nfev is not None: kwargs['maxfev'] = max_nfev
+        x_scale = kwargs.pop('x_scale', None)
+        if x_scale is not None and not (isinstance(x_scale, str) and x_scale == 'jac'):
+            kwargs['diag'] = 1 / np.resize(np.asarray(x_scale, dtype=float), n)
+        for key in ('loss', 'f_scale', 'jac_sparsity'): kwargs.pop(key, None)
+        res = leastsq(func, p0, Dfun=jac if callable(jac) else None, full_output=1, **kwargs)
         popt, pcov, infodict, errmsg, ier = res
         ysize = len(infodict['fvec'])
         cost = np.sum(infodict['fvec'] ** 2)
-        if ier not in [1, 2, 3, 4]:
+        if ier == 5 and not strict:
+            # the evaluation budget is exhausted, the same as status 0 of least_squares
+            infodict['status'] = 0
+        elif ier not in [1, 2, 3, 4]:
             raise RuntimeError("Optimal parameters not found: " + errmsg)
+        else:
+            infodict['status'] = ier
     else:
         # Rename maxfev (leastsq) to max_nfev (least_squares), if specified.
         if 'max_nfev' not in kwargs:
@@ -106,33 +270,29 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
 
         res = least_squares(func, p0, jac=jac, bounds=bounds, method=method, **kwargs)
 
-        if not res.success:
+        if not res.success and (strict or res.status != 0):
                 raise RuntimeError("Optimal parameters not found: " + res.message)
 
         ysize = len(res.fun)
-        cost = 2 * res.cost  # res.cost is half sum of squares!
+        cost = np.dot(res.fun, res.fun)  # res.cost is half sum of rho(f**2), which is not sum of squares under a robust loss
         popt = res.x
 
-        # Do Moore-Penrose inverse discarding zero singular values.
-        _, s, VT = svd(res.jac, full_matrices=False)
-        threshold = np.finfo(float).eps * max(res.jac.shape) * s[0]
-        s = s[s > threshold]
-        VT = VT[:s.size]
-        pcov = np.dot(VT.T / s**2, VT)
-        return_full = False
+        pcov = _pinv_cov(res.jac)
+        infodict = {'nfev':res.nfev, 'njev':res.njev, 'fvec':res.fun, 'status':res.status}
+        errmsg, ier = res.message, res.status
 
     warn_cov = False
     if pcov is None:
         # indeterminate covariance
-        pcov = zeros((len(popt), len(popt)), dtype=float)
-        pcov.fill(inf)
+        pcov = np.zeros((len(popt), len(popt)), dtype=float)
+        pcov.fill(np.inf)
         warn_cov = True
     elif not absolute_sigma:
         if ysize > p0.size:
             s_sq = cost / (ysize - p0.size)
             pcov = pcov * s_sq
         else:
-            pcov.fill(inf)
+            pcov.fill(np.inf)
             warn_cov = True
 
     if warn_cov:
@@ -140,6 +300,8 @@ def curve_fit_m(f, xdata, ydata, p0=None, sigma=None, absolute_sigma=False,
     
     #add `cost` output
     if return_full:
+        infodict['nfev'] = infodict.get('nfev', 0) + varpro_nfev
+        infodict['njev'] = (infodict.get('njev') or 0) + varpro_njev
         return popt, pcov, cost, infodict, errmsg, ier
     else:
         return popt, pcov, cost
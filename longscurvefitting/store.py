@@ -0,0 +1,171 @@
+#Fitted-model store -- keep a lot of fitted models on disk, grouped by model name, and evaluate them in batch
+
+import os
+import pathlib
+import json
+
+import numpy as np
+
+from .longscurvefitting import queryModel
+
+def _tupled(key):
+    '''Turn lists back to tuples, which JSON saves as lists, so keys stay hashable.'''
+    return tuple(_tupled(k) for k in key) if isinstance(key, list) else key
+
+class FittedModelStore:
+    '''A store of fitted models. Parameters of models with the same name are kept in one array in shape of (n_fits, n_para),
+    which is saved as a `.npy` file and memory-mapped when loaded, so thousands of fits of a model are evaluated by one vectorized call.
+
+    Parameters:
+        directory: the directory of a saved store, used by `load`
+            Type: string, pathlib.Path
+            Default: None
+    '''
+    def __init__(self, directory=None):
+        self.directory = pathlib.Path(directory) if directory else None
+        self.index = {}     #modelname -> {'operator', 'count'}
+        self.keys = {}      #modelname -> list of keys
+        self.paras = {}     #modelname -> array or list of parameters
+        self._arrays = {}   #modelname -> array of parameters, cached for `predict`
+        self._lookup = None #key -> (modelname, index)
+
+    def add(self, modelname, parameters, key=None, operator='+'):
+        '''Add a fitted model.
+
+        Parameters:
+            modelname: name of model, as `modelname` of report
+                Type: string
+            parameters: fitted parameters
+                Type: array_like
+            key: identity of the fit, e.g. the series key of `fitMany`, which must be unique in the store. If None, the smallest unused integer
+                from the size of the store. Tuples are kept as tuples through `save` and `load`.
+                Type: string, integer or tuple of them
+                Default: None
+            operator: operatation between basic models of an 'operation_' model. It must be the same for all fits of a model.
+                Type: string
+                Default: '+'
+        Returns:
+            None
+        '''
+        paras = []
+        if modelname in self.index and self.index[modelname]['operator'] != operator:
+            raise ValueError('Error -- "%s" is stored with operator "%s", not "%s"' % (modelname, self.index[modelname]['operator'], operator))
+        lookup = self._index()
+        if key is None:
+            key = len(self)
+            while key in lookup: key += 1
+        key = _tupled(key.item() if isinstance(key, np.generic) else key)
+        if key in lookup:
+            raise ValueError('Error -- key %r is stored already, as a fit of "%s"' % (key, lookup[key][0]))
+        if modelname in self.index:
+            self._keys(modelname)	#load keys if it's a saved store
+            paras = self._paras(modelname, writable=True)
+        self.index.setdefault(modelname, {'operator':operator, 'count':0})
+        paras.append(list(parameters))
+        self.paras[modelname] = paras
+        self.keys.setdefault(modelname, []).append(key)
+        self.index[modelname]['count'] += 1
+        self._arrays.pop(modelname, None)
+        lookup[key] = (modelname, self.index[modelname]['count'] - 1)
+
+    def extend(self, report, key=None, operator='+'):
+        '''Add rows of report, e.g. the best model of each series of `fitMany`. Rows with key 'series' use it as key.'''
+        for row in ([report] if isinstance(report, dict) else report):
+            self.add(row['modelname'], row['parameters'], key=row.get('series', key), operator=operator)
+
+    def __len__(self):
+        return sum(meta['count'] for meta in self.index.values())
+
+    def _paras(self, modelname, writable=False):
+        '''Parameters of a model, loaded lazily. It's a list when writable.'''
+        if modelname not in self.paras:
+            self.paras[modelname] = np.load(self.directory / ('%s.npy' % modelname), mmap_mode='r')
+        paras = self.paras[modelname]
+        if writable and not isinstance(paras, list):
+            paras = self.paras[modelname] = np.asarray(paras).tolist()
+        return paras
+
+    def _keys(self, modelname):
+        '''Keys of a model, loaded lazily.'''
+        if modelname not in self.keys:
+            self.keys[modelname] = [_tupled(key) for key in json.loads((self.directory / ('%s.keys.json' % modelname)).read_text())]
+        return self.keys[modelname]
+
+    def parameters(self, modelname):
+        '''Parameters of all fits of a model. The array is cached until a fit of the model is added.
+
+        Returns:
+            keys, parameters: keys of fits and their parameters in shape of (n_fits, n_para)
+                Type: tuple
+        '''
+        if modelname not in self._arrays:
+            self._arrays[modelname] = np.asarray(self._paras(modelname), dtype=float)
+        return self._keys(modelname), self._arrays[modelname]
+
+    def _index(self):
+        '''Where fits are by key, built lazily and kept up to date by `add`.'''
+        if self._lookup is None:
+            self._lookup = {k: (name, i) for name in self.index for i, k in enumerate(self._keys(name))}
+        return self._lookup
+
+    def save(self, directory=None):
+        '''Save the store to a directory, with an `index.json`, and a `.npy` file of parameters and a `.keys.json` file of keys for each model.
+        If `directory` is None, the store is saved to the directory it's loaded from, and an in-memory store raises `ValueError`.
+        '''
+        directory = pathlib.Path(directory) if directory else self.directory
+        if directory is None:
+            raise ValueError('Error -- a directory is required to save an in-memory store')
+        directory.mkdir(parents=True, exist_ok=True)
+        for modelname in self.index:
+            keys, paras = self.parameters(modelname)
+            #write aside and replace, since the old file may be memory-mapped
+            path = directory / ('%s.npy' % modelname)
+            with open(path.with_suffix('.tmp'), 'wb') as file:
+                np.save(file, paras)
+            os.replace(path.with_suffix('.tmp'), path)
+            (directory / ('%s.keys.json' % modelname)).write_text(json.dumps(keys))
+        (directory / 'index.json').write_text(json.dumps(self.index))
+
+    @classmethod
+    def load(cls, directory):
+        '''Load a saved store. Only the index is read, parameters are memory-mapped when a model is used.'''
+        store = cls(directory)
+        store.index = json.loads((store.directory / 'index.json').read_text())
+        return store
+
+    def evaluate(self, xdata, modelname=None, chunksize=65536):
+        '''Evaluate fitted models over `xdata` in batch, by one vectorized call per model (and per chunk).
+
+        Parameters:
+            xdata: the independent variable
+                Type: array_like
+            modelname: the model to evaluate. If None, all models.
+                Type: string
+                Default: None
+            chunksize: max number of fits evaluated by a call, to limit memory
+                Type: integer
+                Default: 65536
+        Returns:
+            results: modelname -> (keys, ydata in shape of (n_fits, xdata.size))
+                Type: dictionary
+        '''
+        xdata = np.asarray(xdata, dtype=float)
+        results = {}
+        for name in ([modelname] if modelname else list(self.index)):
+            model = queryModel(name, operator=self.index[name]['operator'])
+            keys, paras = self.parameters(name)
+            ydata = np.empty((len(keys), xdata.size))
+            for start in range(0, len(keys), chunksize):
+                block = paras[start:start+chunksize]
+                try:
+                    ydata[start:start+len(block)] = model(xdata, *block.T[..., None])
+                except (ValueError, IndexError):	#models which don't broadcast on parameters
+                    ydata[start:start+len(block)] = [model(xdata, *p) for p in block]
+            results[name] = (keys, ydata)
+        return results
+
+    def predict(self, key, xdata):
+        '''Evaluate a single fit by its key. Only its row of parameters is read, so it doesn't copy all fits of the model after `add`.'''
+        name, i = self._index()[key]
+        model = queryModel(name, operator=self.index[name]['operator'])
+        return model(np.asarray(xdata, dtype=float), *np.asarray(self._paras(name)[i], dtype=float))
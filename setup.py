@@ -15,7 +15,7 @@ setup(
 	long_description=long_description,
 	long_description_content_type='text/markdown',
 	url='https://github.com/longavailable/adaptive-curvefitting',
-	packages=find_packages(),
+	packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
 	classifiers=[
 		'Programming Language :: Python :: 3',
 		'License :: OSI Approved :: MIT License',
@@ -27,4 +27,8 @@ setup(
 		'matplotlib',
 		'scipy',
 	 ],
+	extras_require={
+		'parquet': ['pyarrow'],
+		'numba': ['numba'],
+	},
 )
\ No newline at end of file
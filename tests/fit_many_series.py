@@ -0,0 +1,15 @@
+import numpy as np
+
+from longscurvefitting import fitMany
+
+#synthetic sensor series
+rng = np.random.default_rng(0)
+xdata = np.linspace(0,10,30)
+series = [('sensor-%d' % i, xdata, 3*np.exp(-(xdata-5)**2/2) + rng.normal(0,0.1,xdata.size)) for i in range(10)]
+
+models=['constant', 'linear', 'quadratic', 'gaussian', 'erf', 'exponential']
+
+if __name__ == '__main__':
+	#the potential models are generated once and reused for all series
+	for key, report in fitMany(series, models, top=3, output='curvefit/fit_many_report.csv'):
+		print(key, report[0]['modelname'], report[0]['cost'])
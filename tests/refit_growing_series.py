@@ -0,0 +1,19 @@
+import numpy as np
+
+from longscurvefitting import IncrementalFitter
+
+#a synthetic series which grows by 10 points every minute
+rng = np.random.default_rng(0)
+xdata = np.linspace(0,10,500)
+ydata = 3*np.exp(-(xdata-5)**2/2) + 0.5*xdata + rng.normal(0,0.1,xdata.size)
+
+models=['constant', 'linear', 'quadratic', 'gaussian', 'erf', 'exponential']
+
+if __name__ == '__main__':
+	fitter = IncrementalFitter(models, top=5)
+	fitter.append(xdata[:200], ydata[:200])	#the first search over all models
+	for i in range(200, xdata.size, 10):
+		#only the best models are refitted, warm-started from their last parameters
+		report = fitter.append(xdata[i:i+10], ydata[i:i+10])
+	print(report[0]['modelname'], report[0]['parameters'])
+	print('%d searches and %d refits' % (fitter.searches, fitter.refits))
@@ -0,0 +1,396 @@
+import numpy as np
+
+from longscurvefitting import generateModels
+
+#the number of models without pruning is the same as the exhaustive enumeration, with and without piecewise models
+counts = {False: [13, 94, 439, 1594], True: [182, 263, 608, 1763]}
+for piecewise, expected in counts.items():
+	for maxCombination, count in zip((1, 2, 3, 4), expected):
+		models = generateModels(dataLength=100, piecewise=piecewise, maxCombination=maxCombination, prune=False)
+		assert len(models) == count, (piecewise, maxCombination, len(models), count)
+		assert len({m['name'] for m in models}) == count
+print('generateModels: counts are the same as the exhaustive enumeration')
+
+#maxCombination=0 keeps piecewise models only, without basic ones
+models = generateModels(dataLength=100, piecewise=True, maxCombination=0)
+assert len(models) == 169 and all(m['operator'] == 'piecewise' for m in models), len(models)
+print('generateModels: maxCombination=0 generates piecewise models only')
+
+from longscurvefitting import generateFunction, fitModels
+
+#piecewise models of other than linear pieces start from a breakpoint near the true one, x0=4
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 200)
+ydata = np.where(xdata < 4, 2*xdata, 8 + 0.5*(xdata - 4)**2) + rng.normal(0, 0.1, xdata.size)
+row = fitModels([generateFunction(['linear', 'quadratic'], operator='piecewise')], xdata, ydata, silent=True)[0]
+assert abs(row['parameters'][0] - 4) < 0.1 and row['cost'] < 2.5, row
+print('funcGuess: piecewise_linear_quadratic converges to x0=%.3f' % row['parameters'][0])
+
+from longscurvefitting import curve_fit_batch, curve_fit_m
+
+#the vectorized engine reaches the costs of MINPACK `lm`, and doesn't report diverged series as converged
+rng = np.random.default_rng(0)
+gaussian = generateFunction(['gaussian'])['model']
+xdata = np.linspace(0, 10, 50)
+n = 2000
+a, b, c = rng.uniform(1, 5, n), rng.uniform(2, 8, n), rng.uniform(0.3, 3, n)
+ydata = gaussian(xdata, a[:, None], b[:, None], c[:, None]) + rng.normal(0, 0.1, (n, xdata.size))
+popt, pcov, cost, success = curve_fit_batch(gaussian, xdata, ydata, p0=[2, 5, 1])
+reference = np.array([curve_fit_m(gaussian, xdata, y, p0=[2, 5, 1], method='lm', linear_solve=False, strict=False)[2] for y in ydata])
+worse = cost > 2 * reference + 0.1
+assert worse.sum() <= n // 200 and not (worse & success).any(), (worse.sum(), (worse & success).sum())
+print('curve_fit_batch: %d of %d series worse than curve_fit_m(method="lm")' % (worse.sum(), n))
+
+#variable projection and the polish share one evaluation budget
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 100)
+ydata = gaussian(xdata, 3, 5, 1) + rng.normal(0, 0.1, xdata.size)
+for method in ('lm', 'trf'):
+	for budget in (5, 10):
+		infodict = curve_fit_m(gaussian, xdata, ydata, p0=[1, 1, 0.3], max_nfev=budget, strict=False, full_output=True, method=method)[3]
+		assert infodict['nfev'] <= budget + 2, (method, budget, infodict['nfev'])	#the polish evaluates its start at least
+print('curve_fit_m: variable projection spends the evaluation budget of the fit')
+
+import tempfile
+
+from longscurvefitting import FittedModelStore
+
+#tuple keys survive save and load, and a model can't be added with another operator
+store = FittedModelStore()
+store.add('operation_gaussian_linear', [1, 2, 3, 4, 5], key=('station', 1))
+try:
+	store.add('operation_gaussian_linear', [1, 2, 3, 4, 5], key=('station', 2), operator='*')
+	raise AssertionError('a model is added with another operator')
+except ValueError:
+	pass
+with tempfile.TemporaryDirectory() as directory:
+	store.save(directory)
+	loaded = FittedModelStore.load(directory)
+	assert np.allclose(loaded.predict(('station', 1), [0, 1]), store.predict(('station', 1), [0, 1]))
+	del loaded	#release the memory-mapped parameters
+print('FittedModelStore: tuple keys are predicted after save and load')
+
+#keys are unique, and fits added without a key skip the keys given explicitly
+store = FittedModelStore()
+store.add('gaussian', [1, 2, 3], key=1)
+store.add('linear', [1, 2])
+assert store.keys['linear'] == [2], store.keys
+try:
+	store.add('linear', [1, 2], key=1)
+	raise AssertionError('a key is stored twice')
+except ValueError:
+	pass
+print('FittedModelStore: keys are unique')
+
+#an in-memory store is saved to a directory given explicitly only
+try:
+	store.save()
+	raise AssertionError('an in-memory store is saved without a directory')
+except ValueError:
+	pass
+print('FittedModelStore: an in-memory store requires a directory to save')
+
+from longscurvefitting import reducedSearch
+
+#per-point sigma on unsorted data is sorted along with the data when piecewise models are refined
+rng = np.random.default_rng(0)
+xdata = rng.uniform(0, 10, 50000)
+sigma = np.where(xdata < 5, 0.01, 10.0)
+ydata = 3*np.exp(-(xdata-4)**2/2) + 0.5*xdata + rng.normal(0, 1, xdata.size) * sigma
+models = [generateFunction(['gaussian', 'linear']), generateFunction(['linear', 'linear'], operator='piecewise')]
+refined = {row['modelname']: row for row in reducedSearch(models, xdata, ydata, size=2000, refine=2, silent=True, sigma=sigma) if row['points'] == xdata.size}
+direct = fitModels(models[:1], xdata, ydata, silent=True, sigma=sigma)[0]
+assert refined['operation_gaussian_linear']['cost'] < 1.01 * direct['cost'], (refined['operation_gaussian_linear']['cost'], direct['cost'])
+print('reducedSearch: refined cost %.1f with per-point sigma on unsorted x' % direct['cost'])
+
+#per-point weights apply to data not reduced, and are subsampled along with the data
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 500)
+weights = np.where(xdata < 5, 100.0, 0.01)
+ydata = 2*xdata + 1 + np.where(xdata < 5, 0.0, 5.0) + rng.normal(0, 0.1, xdata.size)
+models = [generateFunction(['linear'])]
+direct = fitModels(models, xdata, ydata, silent=True, weights=weights)[0]
+for reduce in ('bin', 'subsample'):
+	row = reducedSearch(models, xdata, ydata, reduce=reduce, silent=True, weights=weights)[0]
+	assert np.isclose(row['cost'], direct['cost']), (reduce, row['cost'], direct['cost'])
+subsampled = reducedSearch(models, xdata, ydata, reduce='subsample', size=100, refine=0, silent=True, weights=weights)[0]
+assert subsampled['points'] == 100 and abs(subsampled['parameters'][1] - 1) < 0.2, subsampled
+print('reducedSearch: weights apply to data not reduced, and to subsamples')
+
+
+#`starts=1` fits from one start, and isn't passed on to the solver
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 200)
+ydata = 3*np.exp(-(xdata-5)**2/2) + 0.5*xdata + rng.normal(0, 0.1, xdata.size)
+rows = fitModels(generateModels(['gaussian', 'linear', 'exponential'], dataLength=xdata.size), xdata, ydata, silent=True, failed=True, starts=1)
+assert all(row['status'] == 'converged' for row in rows), [row['message'] for row in rows if row['status'] != 'converged']
+print('fitModels: %d models converged with starts=1' % len(rows))
+
+#data-driven initial guesses converge no fewer models than the default ones, for every operator, on the example of `curvefitting.py`
+xdata = np.arange(21.0)
+ydata = np.array([50,46,45,49,58,80,120,110,108,106,105,102,101,110,120,140,160,170,165,160,165], dtype=float)
+functions = ['constant', 'linear', 'quadratic', 'cubic', 'gaussian', 'erf', 'cauchy', 'exponential', 'power_law', 'pearson3']
+for operator in ('+', '-', '*', '/'):
+	models = generateModels(functions, dataLength=xdata.size, operator=operator)
+	converged = [sum(row['status'] == 'converged' for row in fitModels(models, xdata, ydata, silent=True, failed=True, guess=guess)) for guess in (True, False)]
+	assert converged[0] >= converged[1], (operator, converged)
+	print('funcGuess: %d (guessed) and %d (default) of %d models converged with operator "%s"' % (*converged, len(models), operator))
+
+import importlib.util
+import os
+
+from longscurvefitting import openReport
+
+#a Parquet report starting with failed models keeps parameters as list<double>, and isn't overwritten
+if importlib.util.find_spec('pyarrow') is not None:
+	import pyarrow.parquet
+	failed = {'modelname':'gaussian', 'form':None, 'paras_symbol':None, 'parameters':[], 'stdevs':[], 'cost':np.inf, 'status':'failed', 'message':'RuntimeError'}
+	fitted = dict(failed, form='gaussian(x, a, b, c)', paras_symbol='a, b, c', parameters=[1.0, 2.0, 3.0], stdevs=[0.1, 0.2, 0.3], cost=1.0, status='converged', message='')
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, 'report.parquet')
+		with openReport(path, batch_size=2) as writer:
+			writer.write([failed, failed])
+			writer.write([fitted, fitted])
+		table = pyarrow.parquet.read_table(path)
+		assert table.num_rows == 4 and table.column('parameters').to_pylist()[-1] == [1.0, 2.0, 3.0], table
+		try:
+			openReport(path)
+			raise AssertionError('an existing Parquet report is overwritten')
+		except FileExistsError:
+			pass
+	print('ParquetReportWriter: parameters are %s after a row group of failed models' % table.schema.field('parameters').type)
+
+from longscurvefitting import halvingSearch
+from longscurvefitting.longscurvefitting import FITTED_STATUSES
+
+#survivors of halving keep the parameters of former rounds when the run budget runs out in a later round
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 200)
+ydata = 3*np.exp(-(xdata-5)**2/2) + 0.5*xdata + rng.normal(0, 0.1, xdata.size)
+rows = halvingSearch(generateModels(dataLength=xdata.size), xdata, ydata, failed=True, time_budget=0.3, silent=True)
+fitted = [row for row in rows if row['status'] in FITTED_STATUSES]
+assert fitted and all(row['parameters'] and np.isfinite(row['cost']) for row in fitted), [row['status'] for row in rows]
+print('halvingSearch: %d of %d models fitted within time_budget=0.3' % (len(fitted), len(rows)))
+
+from longscurvefitting import oneClickCurveFitting
+
+#feedback of a run without fitted models raises a clear error
+with tempfile.TemporaryDirectory() as directory:
+	try:
+		oneClickCurveFitting(xdata, ydata, functions=['linear', 'gaussian'], plot_opt=0, silent=True, feedback=True, time_budget=0, output=os.path.join(directory, 'report.csv'))
+		raise AssertionError('feedback without fitted models')
+	except RuntimeError:
+		pass
+print('oneClickCurveFitting: feedback without fitted models raises RuntimeError')
+
+from longscurvefitting import stepwiseSearch
+from longscurvefitting.longscurvefitting import criterionKey, _parents
+
+#composites of 3 basic models extend the best arithmetic pairs only, not the pieces of piecewise models
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 200)
+ydata = np.where(xdata < 4, 2*xdata, 8 + 0.5*(xdata - 4)**2) + rng.normal(0, 0.1, xdata.size)
+models = generateModels(['linear', 'quadratic', 'gaussian', 'exponential'], dataLength=xdata.size, piecewise=True, maxCombination=3)
+functions = {m['name']: m for m in models}
+rows = stepwiseSearch(models, xdata, ydata, beam=2, min_improvement=-np.inf, silent=True)
+pairs = sorted((row for row in rows if len(functions[row['modelname']]['functions']) == 2 and 'PIECEWISE' not in functions[row['modelname']]['operator'].upper()), key=criterionKey('bic'))
+frontier = {tuple(sorted(functions[row['modelname']]['functions'])) for row in pairs[:2]}
+triples = [row for row in rows if len(functions[row['modelname']]['functions']) == 3]
+assert triples and all(_parents(functions[row['modelname']]['functions']) & frontier for row in triples), frontier
+print('stepwiseSearch: %d composites of 3 basic models extend the best arithmetic pairs only' % len(triples))
+
+import longscurvefitting.incremental
+from longscurvefitting import IncrementalFitter
+
+#the fitter reuses the potential models generated once, and searches all models if none is fitted yet even with full=False
+rng = np.random.default_rng(0)
+fitter = IncrementalFitter(['linear', 'gaussian'], piecewise=True, top=1)
+generate, longscurvefitting.incremental.generateModels = longscurvefitting.incremental.generateModels, None
+try:
+	fitter.append(np.arange(10.0), rng.normal(0, 1, 10))
+	fitter.append(np.arange(10.0, 40.0), rng.normal(0, 1, 30))
+	assert len(fitter.models) == len(fitter.candidates) > 3, len(fitter.models)
+	fitter.report.clear()
+	assert fitter.refit(full=False) and fitter.searches == 3, fitter.searches
+finally:
+	longscurvefitting.incremental.generateModels = generate
+print('IncrementalFitter: %d potential models generated once' % len(fitter.candidates))
+
+#a column not in the header of a csv report isn't dropped silently, and a '.json' report isn't written as JSON Lines
+with tempfile.TemporaryDirectory() as directory:
+	path = os.path.join(directory, 'report.csv')
+	with openReport(path) as writer:
+		writer.write([{'modelname':'linear', 'cost':1.0}, {'modelname':'gaussian', 'cost':2.0, 'points':10}])
+		try:
+			writer.write({'modelname':'cubic', 'cost':3.0, 'starts':5})
+			raise AssertionError('a column not in the header is dropped')
+		except ValueError:
+			pass
+	with openReport(path) as writer:
+		writer.write({'modelname':'cubic', 'cost':3.0})
+	with open(path) as f:
+		lines = f.read().splitlines()
+	assert lines == ['modelname,cost,points', 'linear,1.0,', 'gaussian,2.0,10', 'cubic,3.0,'], lines
+	try:
+		openReport(os.path.join(directory, 'report.json'))
+		raise AssertionError('a .json report is written as JSON Lines')
+	except ValueError:
+		pass
+print('CSVReportWriter: the header is all columns of the first rows')
+
+#n_jobs of 0 or below -1 is rejected before a pool is created
+for n_jobs in (0, -2):
+	try:
+		fitModels([generateFunction(['linear'])], np.arange(5.0), np.arange(5.0), n_jobs=n_jobs, silent=True)
+		raise AssertionError('n_jobs=%d is accepted' % n_jobs)
+	except ValueError:
+		pass
+print('fitModels: n_jobs of 0 or below -1 raises ValueError')
+
+from longscurvefitting._helpers import plotModels
+
+#no models to plot, e.g. when all fits failed, draws nothing in any format
+if importlib.util.find_spec('matplotlib') is not None:
+	for plot_format in ('png', 'pdf', 'grid'):
+		plotModels([], np.arange(5.0), np.arange(5.0), plot_format=plot_format)
+	print('plotModels: no models, no figures')
+	#the same rule of n_jobs as fitting
+	try:
+		plotModels([('linear', np.arange(5.0))], np.arange(5.0), np.arange(5.0), n_jobs=-2)
+		raise AssertionError('n_jobs=-2 is accepted')
+	except ValueError:
+		pass
+	print('plotModels: n_jobs=-2 raises ValueError')
+
+from longscurvefitting import basicModels, funcArgsNr
+
+#analytic Jacobians of basic models and of composites match central differences
+xdata = np.linspace(0.5, 10, 50)
+for functions, operator in [([m['name']], '+') for m in basicModels] + [(['gaussian', 'linear'], op) for op in ('+', '-', '*', '/')] + [(['exponential', 'power_law', 'erf'], '*')]:
+	model = generateFunction(functions, operator=operator)['model']
+	p = np.linspace(1.2, 0.6, funcArgsNr(model) - 1)
+	step = 1e-6 * np.maximum(np.abs(p), 1)
+	numeric = np.stack([(model(xdata, *(p + np.eye(p.size)[i]*step[i])) - model(xdata, *(p - np.eye(p.size)[i]*step[i]))) / (2*step[i]) for i in range(p.size)], axis=-1)
+	assert np.allclose(model.jac(xdata, *p), numeric, rtol=1e-4, atol=1e-6), (functions, operator)
+print('funcJac: analytic Jacobians match central differences for %d basic models and composites' % len(basicModels))
+
+#closed-form solutions of polynomials and variable projection reach the costs of plain iterative fits
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 100)
+ydata = 3*np.exp(-(xdata-5)**2/2) + 0.5*xdata + rng.normal(0, 0.1, xdata.size)
+for functions in (['cubic'], ['quadratic', 'linear'], ['gaussian'], ['gaussian', 'linear']):
+	model = generateFunction(functions)['model']
+	p0 = np.ones(funcArgsNr(model) - 1)
+	if 'gaussian' in functions: p0[:3] = [2, 4, 1.5]
+	solved = curve_fit_m(model, xdata, ydata, p0=p0, full_output=True)
+	plain = curve_fit_m(model, xdata, ydata, p0=p0, linear_solve=False)
+	assert solved[2] <= plain[2] * (1 + 1e-6) + 1e-12, (functions, solved[2], plain[2])
+	if functions == ['cubic']:
+		assert solved[3]['nfev'] == 1 and np.isclose(solved[2], np.sum((np.polyval(np.polyfit(xdata, ydata, 3), xdata) - ydata)**2))
+print('curve_fit_m: linear solves reach the costs of plain fits, and cubic is solved in one evaluation')
+
+from longscurvefitting import Leaf, Piecewise, compileExpr, modelExpr, basicModels_dict
+from longscurvefitting.expressions import _evaluator
+
+#models compiled from expression trees evaluate the arithmetic and the pieces of basic models, and equal trees share one evaluator
+xdata = np.linspace(0.5, 10, 50)
+g, l, e = (basicModels_dict[name]['model'] for name in ('gaussian', 'linear', 'exponential'))
+pg, pl, pe = [3, 5, 1], [0.5, 1], [1, 0.2]
+expected = {'+': g(xdata, *pg) + l(xdata, *pl) + e(xdata, *pe), '-': g(xdata, *pg) - l(xdata, *pl) - e(xdata, *pe),
+            '*': g(xdata, *pg) * l(xdata, *pl) * e(xdata, *pe), '/': g(xdata, *pg) / l(xdata, *pl) / e(xdata, *pe)}
+for operator, values in expected.items():
+	model = generateFunction(['gaussian', 'linear', 'exponential'], operator=operator)['model']
+	assert np.allclose(model(xdata, *pg, *pl, *pe), values), operator
+model = compileExpr(Leaf('gaussian') * (Leaf('linear') + Leaf('exponential')))
+assert np.allclose(model(xdata, *pg, *pl, *pe), g(xdata, *pg) * (l(xdata, *pl) + e(xdata, *pe)))
+assert modelExpr(['gaussian', 'linear']) == Leaf('gaussian') + Leaf('linear') and compileExpr(Leaf('gaussian') + Leaf('linear')).__name__ == 'operation_gaussian_linear'
+assert _evaluator(modelExpr(['gaussian', 'linear'])) is _evaluator(Leaf('gaussian') + Leaf('linear'))
+#discontinuous pieces split at x0
+model = compileExpr(Piecewise([Leaf('linear'), Leaf('linear')], continuous=False))
+assert np.allclose(model(xdata, 4, *pl, 2, 0), np.where(xdata < 4, l(xdata, *pl), l(xdata, 2, 0)))
+print('compileExpr: composites and piecewise models evaluate the same as their basic models')
+
+from longscurvefitting import summarizeReport
+
+#every row records its wall time, evaluations, status and failure reason, and failed models are kept with failed=True
+xdata = np.linspace(0, 10, 100)
+ydata = 3*np.exp(-(xdata-5)**2/2) + 0.5*xdata
+def broken(x, a, b):
+	raise FloatingPointError('diverged')
+broken = {'name':'broken', 'model':broken}
+rows = fitModels([generateFunction(['gaussian', 'linear']), generateFunction(['linear']), broken], xdata, ydata, silent=True, failed=True)
+assert [row['status'] for row in rows] == ['converged', 'converged', 'failed'], [row['status'] for row in rows]
+assert all(row['time'] > 0 and row['nfev'] > 0 for row in rows[:2]) and rows[2]['message'] == 'FloatingPointError: diverged' and rows[2]['cost'] == np.inf, rows[2]
+assert len(fitModels([broken], xdata, ydata, silent=True)) == 0
+stats = summarizeReport(rows)
+assert (stats['models'], stats['converged'], stats['failed'], stats['nfev']) == (3, 2, 1, rows[0]['nfev'] + rows[1]['nfev']), stats
+print('summarizeReport: %d converged, %d failed in %.3fs and %d evaluations' % (stats['converged'], stats['failed'], stats['time'], stats['nfev']))
+
+import time
+
+from longscurvefitting import FitTimeout
+
+#a fit is stopped by `timeout`, and models not started within `time_budget` are reported as timed out without fitting
+def slow(x, a, b, c):
+	time.sleep(0.01)
+	return a*np.exp(-(x-b)**2/(2*c**2))
+xdata = np.linspace(0, 10, 100)
+ydata = 3*np.exp(-(xdata-5)**2/2)
+try:
+	curve_fit_m(slow, xdata, ydata, p0=[1, 1, 5], timeout=0.05)
+	raise AssertionError('a fit runs beyond timeout')
+except FitTimeout as e:
+	assert 0 < e.nfev <= 6, e.nfev
+slow = {'name':'slow', 'model':slow}
+row = fitModels([slow], xdata, ydata, silent=True, failed=True, timeout=0.05)[0]
+assert row['status'] == 'timeout' and row['nfev'] > 0 and row['time'] < 0.5, row
+rows = fitModels([slow, generateFunction(['gaussian']), generateFunction(['linear'])], xdata, ydata, silent=True, failed=True, time_budget=0.05)
+assert [row['status'] for row in rows] == ['timeout'] * 3 and rows[-1]['nfev'] == 0, [(row['status'], row['nfev']) for row in rows]
+print('fitModels: fits stop by timeout, and models beyond time_budget are not started')
+
+from longscurvefitting import multiStart
+
+#multi-start escapes from the local minimum of a gaussian started far from its peak, and stops once starts agree on the best cost
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 200)
+ydata = 3*np.exp(-(xdata-8)**2/(2*0.3**2)) + rng.normal(0, 0.05, xdata.size)
+m = dict(generateFunction(['gaussian']), p0=[1, 2, 0.3])
+single = fitModels([m], xdata, ydata, silent=True, failed=True)[0]
+row = multiStart(m, xdata, ydata, starts=64, agree=3)
+assert row['cost'] < 0.1 * single['cost'] and abs(row['parameters'][1] - 8) < 0.05, (row['cost'], single['cost'], row['parameters'])
+assert row['agreed'] >= 3 and row['starts'] < 64 and len(row['costs']) == row['starts'] and row['nfev'] >= single['nfev'], row
+print('multiStart: cost %.3f from %d starts, against %.3f from a single start' % (row['cost'], row['starts'], single['cost']))
+
+from longscurvefitting import piecewiseSparsity
+from longscurvefitting.longscurvefitting import getBounds
+
+#weights are sigma**-2, a robust loss resists outliers, 2-D sigma works with 'lm', and a sparse Jacobian of a piecewise model reaches the dense one
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 100)
+sigma = rng.uniform(0.1, 1, xdata.size)
+ydata = 2*xdata + 1 + rng.normal(0, 1, xdata.size) * sigma
+linear = generateFunction(['linear'])['model']
+by_sigma, by_weights = (curve_fit_m(linear, xdata, ydata, p0=[1, 1], method='trf', **options) for options in ({'sigma':sigma}, {'weights':sigma**-2}))
+assert np.allclose(by_sigma[0], by_weights[0]) and np.isclose(by_sigma[2], by_weights[2]), (by_sigma[0], by_weights[0])
+assert np.allclose(curve_fit_m(linear, xdata, ydata, p0=[1, 1], method='lm', sigma=np.diag(sigma**2))[0], by_sigma[0])
+outliers = ydata.copy()
+outliers[::10] += 50
+robust = curve_fit_m(linear, xdata, outliers, p0=[1, 1], loss='soft_l1', f_scale=1.0)[0]
+plain = curve_fit_m(linear, xdata, outliers, p0=[1, 1])[0]
+assert abs(robust[0] - 2) < 0.1 and abs(robust[1] - 1) < abs(plain[1] - 1), (robust, plain)
+ydata = np.where(xdata < 4, 2*xdata, 8 + 0.5*(xdata - 4)**2) + rng.normal(0, 0.1, xdata.size)
+piecewise = generateFunction(['linear', 'quadratic'], operator='piecewise')
+dense, sparse = (fitModels([piecewise], xdata, ydata, silent=True, **options)[0] for options in ({}, {'jac_sparsity':'auto'}))
+assert sparse['cost'] <= 1.01 * dense['cost'], (sparse['cost'], dense['cost'])
+assert piecewiseSparsity(piecewise['model'], xdata, getBounds(piecewise['model'], xdata, ydata)).shape == (xdata.size, len(dense['parameters']))
+print('curve_fit_m: weights, robust loss, 2-D sigma with "lm" and sparse Jacobians of piecewise models')
+
+#BIC ranks the true model first, while cost favours the model with more parameters
+rng = np.random.default_rng(0)
+xdata = np.linspace(0, 10, 100)
+ydata = 2*xdata + 1 + rng.normal(0, 1, xdata.size)
+rows = fitModels([generateFunction(['linear']), generateFunction(['cubic'])], xdata, ydata, silent=True)
+assert [row['modelname'] for row in sorted(rows, key=criterionKey('cost'))] == ['cubic', 'linear']
+assert [row['modelname'] for row in sorted(rows, key=criterionKey('bic'))] == ['linear', 'cubic']
+assert np.isclose(rows[0]['bic'], xdata.size*np.log(rows[0]['cost']/xdata.size) + 2*np.log(xdata.size)), rows[0]
+print('criterionKey: BIC ranks linear (%.1f) before cubic (%.1f)' % (rows[0]['bic'], rows[1]['bic']))